@@ -1,23 +1,43 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse
 from app.ingestion import ingest_document
 from app.rag import EmbeddingModel, embed_chunks, retrieve_relevant_chunks, prepare_chunks_for_embedding, get_chroma_client, get_or_create_collection, CHROMA_DB_DIR
 from app.qa import answer_query, build_sources, format_references
 from app.translator import translate_text, detect_language as tr_detect
 import os
+import io
+import sys
 import tempfile
 import shutil
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
 import langdetect
 from dotenv import load_dotenv
-from app.embeddings import summarize_text, summarize_document
-import json
+from app.embeddings import summarize_text, summarize_document_async
+import orjson
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 load_dotenv()
 
+# Deterministic langdetect output (it samples randomly unless seeded)
+langdetect.DetectorFactory.seed = 0
 
-app = FastAPI()
+# Target languages served by DeepL; others fall back to OpenAI
+_DEEPL_LANGS = frozenset({"EN", "FR", "NL", "ES", "DE", "IT", "PT", "RU", "JA", "ZH"})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pruner = asyncio.create_task(_prune_rate_state())
+    yield
+    pruner.cancel()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Security & CORS configuration
 API_KEY = os.getenv("API_KEY") or os.getenv("DOCQABOT_API_KEY")
@@ -44,18 +64,55 @@ def require_api_key(x_api_key: Optional[str] = Header(default=None)):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
-_rate_state: dict = {}
+# Token bucket per IP: (tokens, last_refill). Capacity is one minute's worth of requests.
+_rate_state: Dict[str, Tuple[float, float]] = {}
+_rate_lock = threading.Lock()
+
+
 def rate_limiter(request: Request):
-    import time
-    now = time.time()
+    now = time.monotonic()
     ip = request.client.host if request.client else "unknown"
-    window_start = now - 60
-    hist = _rate_state.get(ip, [])
-    hist = [t for t in hist if t >= window_start]
-    if len(hist) >= RATE_LIMIT_PER_MIN:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
-    hist.append(now)
-    _rate_state[ip] = hist
+    with _rate_lock:
+        tokens, last = _rate_state.get(ip, (float(RATE_LIMIT_PER_MIN), now))
+        tokens = min(float(RATE_LIMIT_PER_MIN), tokens + (now - last) * RATE_LIMIT_PER_MIN / 60)
+        if tokens < 1:
+            _rate_state[ip] = (tokens, now)
+            raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        _rate_state[ip] = (tokens - 1, now)
+
+
+async def _prune_rate_state(interval: float = 60.0):
+    # A bucket idle for a full minute has refilled completely, so dropping it changes nothing
+    while True:
+        await asyncio.sleep(interval)
+        cutoff = time.monotonic() - 60
+        with _rate_lock:
+            for ip in [ip for ip, (_, last) in _rate_state.items() if last < cutoff]:
+                del _rate_state[ip]
+
+
+def _save_upload(src, file_path: str) -> None:
+    # Zero-copy kernel-to-kernel copy once starlette has spooled the upload to disk (in-memory spools have no fd)
+    if sys.platform == "linux" and getattr(src, "_rolled", True):
+        try:
+            in_fd = src.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            in_fd = None
+        if in_fd is not None:
+            out_fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                offset = 0
+                while True:
+                    sent = os.sendfile(out_fd, in_fd, offset, 1 << 30)
+                    if sent == 0:
+                        break
+                    offset += sent
+            finally:
+                os.close(out_fd)
+            return
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(src, buffer)
+
 
 @app.post("/api/upload")
 async def upload_api(file: UploadFile = File(...), dataset: str = Form("default"), _: None = Depends(require_api_key), __: None = Depends(rate_limiter)):
@@ -64,9 +121,9 @@ async def upload_api(file: UploadFile = File(...), dataset: str = Form("default"
         if not file.filename:
             raise HTTPException(status_code=400, detail="No filename provided")
         file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        doc = ingest_document(file_path)
+        # Blocking file I/O, parsing and LLM calls run in the threadpool so concurrent uploads don't serialize on the event loop
+        await run_in_threadpool(_save_upload, file.file, file_path)
+        doc = await run_in_threadpool(ingest_document, file_path)
         # Unify text extraction for all file types
         if 'text' in doc:
             text = doc['text']
@@ -75,7 +132,7 @@ async def upload_api(file: UploadFile = File(...), dataset: str = Form("default"
         else:
             raise HTTPException(status_code=500, detail="No text found in document.")
         # Summarize and chunk the document text (returns list of dicts)
-        chunks = summarize_text(text)
+        chunks = await run_in_threadpool(summarize_text, text)
         # Add metadata to each chunk
         chunks = prepare_chunks_for_embedding(
             chunks,
@@ -86,8 +143,9 @@ async def upload_api(file: UploadFile = File(...), dataset: str = Form("default"
         embedding_model = EmbeddingModel(model_name='openai')
         client = get_chroma_client(namespace=dataset)
         _ = get_or_create_collection(client, "doc_chunks")
-        embed_chunks(chunks, embedding_model, client=client, collection_name="doc_chunks", reembed=False)
-        last_docs[dataset] = {"meta": doc, "embedding_model": embedding_model}
+        await run_in_threadpool(embed_chunks, chunks, embedding_model, client=client, collection_name="doc_chunks", reembed=False)
+        # Keep the joined text alongside the metadata so ask/summarize don't re-join pages per request
+        last_docs[dataset] = {"meta": doc, "embedding_model": embedding_model, "text": text}
         return {"filename": file.filename, "metadata": doc}
     except Exception as e:
         print("Exception in /api/upload:", e)
@@ -100,13 +158,13 @@ def translate_api(text: str = Form(...), target_lang: str = Form(...), source_la
     try:
         translated = translate_text(text, target_lang, source_lang)
         detected_lang = langdetect.detect(text)
-        engine = "deepl" if target_lang.upper() in {"EN", "FR", "NL", "ES", "DE", "IT", "PT", "RU", "JA", "ZH"} else "openai"
+        engine = "deepl" if target_lang.upper() in _DEEPL_LANGS else "openai"
         return {"translated": translated, "detected_source_lang": detected_lang, "engine": engine}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.post("/api/ask")
-def ask_api(
+async def ask_api(
     question: str = Form(...),
     doc_id: str = Form(...),
     user_lang: str = Form(...),
@@ -124,26 +182,23 @@ def ask_api(
         embedding_model = ds.get("embedding_model") if ds else EmbeddingModel(model_name='openai')
         if doc is None:
             raise HTTPException(status_code=400, detail="No document uploaded yet.")
-        # Unify text extraction for all file types
-        if 'text' in doc:
-            text = doc['text']
-        elif 'text_by_page' in doc:
-            text = '\n'.join(doc['text_by_page'])
-        else:
+        if not (ds.get("text") or doc.get('text') or doc.get('text_by_page')):
             raise HTTPException(status_code=500, detail="No text found in document.")
         # Translate the question to English for retrieval if needed
         question_lang = tr_detect(question) if question else "en"
         question_en = question
-        # Translate question to EN for retrieval
         doc_language = (doc.get('language') if isinstance(doc.get('language'), str) else None) or 'en'
+        # Question translation (network) and Chroma client setup (local I/O) are independent: run them concurrently
+        tasks = [asyncio.to_thread(get_chroma_client, namespace=dataset)]
         if question_lang and question_lang.lower() != "en":
-            question_en = translate_text(question, target_lang="EN", source_lang=question_lang)
+            tasks.append(asyncio.to_thread(translate_text, question, target_lang="EN", source_lang=question_lang))
+        client, *translated_question = await asyncio.gather(*tasks)
+        if translated_question:
+            question_en = translated_question[0]
 
         # Retrieve relevant chunks from ChromaDB
-        from app.rag import retrieve_relevant_chunks
-        client = get_chroma_client(namespace=dataset)
-        _ = get_or_create_collection(client, "doc_chunks")
-        top_chunks = retrieve_relevant_chunks(
+        top_chunks = await asyncio.to_thread(
+            retrieve_relevant_chunks,
             query=question_en,
             embedding_model=embedding_model,
             client=client,
@@ -154,19 +209,23 @@ def ask_api(
         history = []
         if chat_history:
             try:
-                history = json.loads(chat_history)
+                history = orjson.loads(chat_history)
             except Exception:
                 history = []
         # Generate answer using LLM with context and chat history
-        from app.qa import answer_query
-        original_answer = answer_query(question_en, top_chunks, chat_history=history)
-        # Build deterministic citations only; do not append to answer
-        sources = build_sources(top_chunks)
-        # Back-translate answer to user's language if different from English
+        original_answer = await asyncio.to_thread(answer_query, question_en, top_chunks, chat_history=history)
+        # Back-translate answer to user's language if different from English, building citations meanwhile
         translation_engine = None
         translated_answer = original_answer
+        back_translation = None
         if user_lang and user_lang.lower()[:2] != "en":
-            translated_answer = translate_text(original_answer, target_lang=user_lang, source_lang="EN")
+            back_translation = asyncio.create_task(
+                asyncio.to_thread(translate_text, original_answer, target_lang=user_lang, source_lang="EN")
+            )
+        # Build deterministic citations only; do not append to answer
+        sources = build_sources(top_chunks)
+        if back_translation is not None:
+            translated_answer = await back_translation
             translation_engine = "deepl"
         return {
             "answer": translated_answer,
@@ -222,7 +281,7 @@ async def summarize_api(req: SummarizeRequest, dataset: str = "default", _: None
         if doc is None:
             raise HTTPException(status_code=400, detail="No document uploaded yet.")
         # Run summarization
-        results = summarize_document(
+        results = await summarize_document_async(
             doc,
             mode=req.mode,
             model=req.model,
@@ -232,6 +291,7 @@ async def summarize_api(req: SummarizeRequest, dataset: str = "default", _: None
             chunk_max_tokens=req.chunk_max_tokens,
             overlap=req.overlap,
             cache=req.cache,
+            text=ds.get("text"),
         )
         # Build items and translate summaries if requested
         items: List[SummaryItem] = []
@@ -284,6 +344,9 @@ def reset_dataset(req: DatasetRequest, _: None = Depends(require_api_key), __: N
         target = os.path.join(CHROMA_DB_DIR, req.name)
         if os.path.isdir(target):
             shutil.rmtree(target)
+        # Drop cached client/collection handles that point at the removed directory
+        get_or_create_collection.cache_clear()
+        get_chroma_client.cache_clear()
         if req.name in last_docs:
             last_docs.pop(req.name, None)
         return {"ok": True}
@@ -1,29 +1,38 @@
 import os
+import re
+import string
+import asyncio
 import hashlib
 import logging
 import time
 import csv
-from typing import List, Dict, Any, Optional, Union, Callable
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union, Callable, Tuple
 
 from dotenv import load_dotenv
+import numpy as np
 import tiktoken
-import nltk
-from nltk.tokenize import sent_tokenize
 from openai import RateLimitError
 import backoff
 
+from app.openai_client import get_client as get_openai_client, get_openai_api_key
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
 load_dotenv()
 
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
-# Download punkt for sentence tokenization if not already present
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt_tab')
-
 # Default summarization prompts by domain
 SUMMARIZATION_PROMPTS = {
     "medical": "You are a medical document assistant. Summarize the following text concisely and clearly for a medical professional. Focus on key findings, diagnoses, treatments, and relevant details.\n\nText:\n{input}\n\nSummary:",
@@ -31,36 +40,162 @@ SUMMARIZATION_PROMPTS = {
     "general": "Summarize the following text comprehensively and clearly.\n\nText:\n{input}\n\nSummary:",
 }
 
-# Caching directory for summaries
+# Caching directory for summaries (single SQLite key-value store instead of one file per chunk)
 CACHE_DIR = "./.summary_cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
+CACHE_DB = os.path.join(CACHE_DIR, "summaries.sqlite3")
+
+# Values are zlib-compressed; least recently used entries are evicted once the store exceeds the cap
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(1 << 30)))
+ATIME_FLUSH_EVERY = 64
+
+_cache_conn: Optional[sqlite3.Connection] = None
+_cache_lock = threading.Lock()
+_cache_bytes = 0
+_pending_atimes: Dict[str, float] = {}
+
+# Near-duplicate (SimHash) lookup on exact-key misses; opt-in since it can reuse a summary of slightly different text
+FUZZY_CACHE = os.getenv("SUMMARY_CACHE_FUZZY", "0") == "1"
+SIMHASH_MAX_DISTANCE = 3
+
+_WS_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+# Punctuation ignored by the summary cache key. %+-<=>$ stay, and so do . and , inside numbers (2.5 vs 25),
+# because they change what the text says
+_CANON_PUNCT_TBL = str.maketrans("", "", "".join(c for c in string.punctuation if c not in "%+-<=>$.,") + "“”‘’«»„‚‹›…•·¿¡。、「」『』【】")
+_CANON_SEP_RE = re.compile(r"(?<!\d)[.,]|[.,](?!\d)")
+# Sentence boundary: terminal punctuation + whitespace, or a CJK full stop
+_SENT_RE = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])")
 
 # API usage log file
 API_USAGE_LOG = "./api_usage_log.csv"
 
-# Utility: Clear cache directory
-def clear_cache():
-    for f in os.listdir(CACHE_DIR):
+# Maximum number of summarization requests in flight at once
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+
+def _insert_summaries(conn: sqlite3.Connection, items: List[Tuple[str, str]]) -> None:
+    # Caller holds _cache_lock and an open transaction
+    global _cache_bytes
+    now = time.time()
+    for key, summary in items:
+        value = zlib.compress(summary.encode("utf-8"), 6)
+        old = conn.execute("SELECT size FROM summary_entries WHERE key = ?", (key,)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO summary_entries (key, value, size, atime) VALUES (?, ?, ?, ?)",
+            (key, value, len(value), now)
+        )
+        _cache_bytes += len(value) - (old[0] if old else 0)
+
+def _flush_atimes(conn: sqlite3.Connection) -> None:
+    # Access times are batched in memory so cache hits don't each cost a write
+    if _pending_atimes:
+        conn.executemany("UPDATE summary_entries SET atime = ? WHERE key = ?", [(t, k) for k, t in _pending_atimes.items()])
+        _pending_atimes.clear()
+
+def _evict_summaries(conn: sqlite3.Connection) -> None:
+    # Drop least recently used entries until the store is back under 90% of the cap
+    global _cache_bytes
+    if _cache_bytes <= SUMMARY_CACHE_MAX_BYTES:
+        return
+    _flush_atimes(conn)
+    target = int(SUMMARY_CACHE_MAX_BYTES * 0.9)
+    evicted = 0
+    while _cache_bytes > target:
+        rows = conn.execute("SELECT key, size FROM summary_entries ORDER BY atime LIMIT 256").fetchall()
+        if not rows:
+            break
+        victims = []
+        for key, size in rows:
+            if _cache_bytes <= target:
+                break
+            victims.append((key,))
+            _cache_bytes -= size
+        conn.executemany("DELETE FROM summary_entries WHERE key = ?", victims)
+        conn.executemany("DELETE FROM summary_simhash WHERE key = ?", victims)
+        evicted += len(victims)
+    logging.info(f"Evicted {evicted} cached summaries (LRU, cap {SUMMARY_CACHE_MAX_BYTES} bytes).")
+
+def _migrate_legacy_cache(conn: sqlite3.Connection) -> None:
+    # One-shot import of the old per-chunk .txt files
+    legacy = [f for f in os.listdir(CACHE_DIR) if f.endswith(".txt")]
+    if not legacy:
+        return
+    rows = []
+    for f in legacy:
+        with open(os.path.join(CACHE_DIR, f), "r", encoding="utf-8") as fh:
+            rows.append((f[:-len(".txt")], fh.read()))
+    with conn:
+        _insert_summaries(conn, rows)
+    for f in legacy:
         os.remove(os.path.join(CACHE_DIR, f))
+    logging.info(f"Migrated {len(rows)} cached summaries into {CACHE_DB}.")
+
+def _get_cache_db() -> sqlite3.Connection:
+    global _cache_conn, _cache_bytes
+    with _cache_lock:
+        if _cache_conn is None:
+            conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summary_entries "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, atime REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_summary_atime ON summary_entries (atime)")
+            # SimHash split into four 16-bit bands: any match within distance 3 shares at least one band
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS summary_simhash "
+                "(key TEXT PRIMARY KEY, scope TEXT NOT NULL, b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER)"
+            )
+            for band in ("b0", "b1", "b2", "b3"):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_simhash_{band} ON summary_simhash (scope, {band})")
+            _cache_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summary_entries").fetchone()[0]
+            _migrate_legacy_cache(conn)
+            with conn:
+                _evict_summaries(conn)
+            _cache_conn = conn
+        return _cache_conn
+
+def _read_summary(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    # Caller holds _cache_lock
+    row = conn.execute("SELECT value FROM summary_entries WHERE key = ?", (key,)).fetchone()
+    if not row:
+        return None
+    _pending_atimes[key] = time.time()
+    if len(_pending_atimes) >= ATIME_FLUSH_EVERY:
+        with conn:
+            _flush_atimes(conn)
+    return zlib.decompress(row[0]).decode("utf-8")
+
+# Utility: Clear cache
+def clear_cache():
+    global _cache_bytes
+    conn = _get_cache_db()
+    with _cache_lock, conn:
+        conn.execute("DELETE FROM summary_entries")
+        conn.execute("DELETE FROM summary_simhash")
+        _cache_bytes = 0
+        _pending_atimes.clear()
     logging.info("Summary cache cleared.")
 
-def get_openai_api_key() -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise EnvironmentError("OPENAI_API_KEY not set. Please set your OpenAI API key.")
-    return api_key
+@lru_cache(maxsize=8)
+def _enc(model: str):
+    # encoding_for_model does a registry lookup and may build BPE tables; do it once per model
+    return tiktoken.encoding_for_model(model)
 
 def num_tokens_from_string(string: str, tokenizer: Optional[Callable[[str], List[int]]] = None, model: str = "gpt-4") -> int:
     if tokenizer:
         return len(tokenizer(string))
-    enc = tiktoken.encoding_for_model(model)
-    return len(enc.encode(string))
+    return len(_enc(model).encode(string))
 
 def clean_text(text: str) -> str:
     # Remove excessive line breaks, fix OCR artifacts, etc.
     text = text.replace('\n', ' ').replace('  ', ' ')
     return text.strip()
 
+def split_sentences(text: str) -> List[str]:
+    return _SENT_RE.split(text)
+
 def smart_chunk_text(
     text: str,
     model: str = "gpt-4",
@@ -73,43 +208,52 @@ def smart_chunk_text(
     """
     text = clean_text(text)
     try:
-        sentences = sent_tokenize(text)
+        sentences = split_sentences(text)
     except Exception:
         sentences = text.split('.')
+    enc = _enc(model)
     if tokenizer is None:
-        enc = tiktoken.encoding_for_model(model)
         tokenizer = enc.encode
     chunks = []
-    current_chunk = []
+    # Keep each sentence's token ids so overlap is sliced from them instead of re-tokenizing the chunk.
+    # Sentences are tokenized with the leading space they get when joined, so decoded overlap keeps word breaks.
+    current_sents: List[str] = []
+    current_ids: List[List[int]] = []
     current_tokens = 0
     for sent in sentences:
         sent = sent.strip()
         if not sent:
             continue
-        sent_tokens = len(tokenizer(sent))
-        if current_tokens + sent_tokens > max_tokens:
-            if current_chunk:
-                chunk_text = ' '.join(current_chunk)
-                chunks.append(chunk_text)
+        ids = tokenizer(' ' + sent)
+        if current_tokens + len(ids) > max_tokens:
+            if current_sents:
+                chunks.append(' '.join(current_sents))
                 # Overlap: add last N tokens from previous chunk to next
-                if overlap > 0 and chunk_text:
-                    overlap_tokens = tokenizer(chunk_text)[-overlap:]
-                    overlap_text = tiktoken.encoding_for_model(model).decode(overlap_tokens)
-                    current_chunk = [overlap_text, sent]
-                    current_tokens = len(tokenizer(overlap_text)) + sent_tokens
+                if overlap > 0:
+                    overlap_ids: List[int] = []
+                    for seg in reversed(current_ids):
+                        overlap_ids = list(seg) + overlap_ids
+                        if len(overlap_ids) >= overlap:
+                            break
+                    overlap_ids = overlap_ids[-overlap:]
+                    current_sents = [enc.decode(overlap_ids).strip(), sent]
+                    current_ids = [overlap_ids, ids]
                 else:
-                    current_chunk = [sent]
-                    current_tokens = sent_tokens
+                    current_sents = [sent]
+                    current_ids = [ids]
+                current_tokens = sum(len(seg) for seg in current_ids)
             else:
                 # Sentence too long, force split
                 chunks.append(sent)
-                current_chunk = []
+                current_sents = []
+                current_ids = []
                 current_tokens = 0
         else:
-            current_chunk.append(sent)
-            current_tokens += sent_tokens
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
+            current_sents.append(sent)
+            current_ids.append(ids)
+            current_tokens += len(ids)
+    if current_sents:
+        chunks.append(' '.join(current_sents))
     return chunks
 
 def get_prompt(domain: str = "general", custom_prompt: Optional[str] = None) -> str:
@@ -117,17 +261,95 @@ def get_prompt(domain: str = "general", custom_prompt: Optional[str] = None) ->
         return custom_prompt
     return SUMMARIZATION_PROMPTS.get(domain, SUMMARIZATION_PROMPTS["general"])
 
+def _legacy_cache_key(chunk: str, model: str, prompt_seed: str) -> str:
+    return hashlib.sha256((chunk + model + prompt_seed).encode()).hexdigest()
+
+def _canon(s: str) -> str:
+    # Whitespace/case/punctuation/Unicode-form differences should not invalidate a cached summary
+    s = _CANON_SEP_RE.sub("", unicodedata.normalize("NFKC", s).translate(_CANON_PUNCT_TBL))
+    return _WS_RE.sub(" ", s).strip().lower()
+
+def _cache_key(chunk: str, model: str, prompt_seed: str, canon: Optional[str] = None) -> str:
+    # BLAKE3 is SIMD-accelerated; fall back to SHA-256 if the package is missing
+    data = ((_canon(chunk) if canon is None else canon) + model + prompt_seed).encode()
+    if blake3 is None:
+        return hashlib.sha256(data).hexdigest()
+    return blake3.blake3(data).hexdigest()
+
+def _cache_scope(model: str, prompt_seed: str) -> str:
+    return hashlib.sha256((model + prompt_seed).encode()).hexdigest()
+
+_SIMHASH_SHIFTS = np.arange(64, dtype=np.uint64)
+
+def _simhash(text: str) -> int:
+    """
+    64-bit SimHash over word 3-gram shingles of the canonical text.
+    """
+    words = _WORD_RE.findall(text)
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(sh.encode(), digest_size=8).digest(), "big") for sh in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # Bit matrix (shingles x 64): each column votes +1 for a set bit, -1 for a clear one
+    bits = (hashes[:, None] >> _SIMHASH_SHIFTS) & np.uint64(1)
+    weights = 2 * bits.sum(axis=0, dtype=np.int64) - len(shingles)
+    return int(((weights > 0).astype(np.uint64) << _SIMHASH_SHIFTS).sum())
+
+def _simhash_bands(h: int) -> List[int]:
+    return [(h >> shift) & 0xFFFF for shift in (48, 32, 16, 0)]
+
+def _load_fuzzy_summary(chunk: str, model: str, prompt_seed: str) -> Optional[str]:
+    h = _simhash(_canon(chunk))
+    bands = _simhash_bands(h)
+    conn = _get_cache_db()
+    with _cache_lock:
+        rows = conn.execute(
+            "SELECT key, b0, b1, b2, b3 FROM summary_simhash WHERE scope = ? AND (b0 = ? OR b1 = ? OR b2 = ? OR b3 = ?)",
+            (_cache_scope(model, prompt_seed), *bands)
+        ).fetchall()
+    best_key, best_dist = None, SIMHASH_MAX_DISTANCE + 1
+    for key, b0, b1, b2, b3 in rows:
+        dist = (h ^ ((b0 << 48) | (b1 << 32) | (b2 << 16) | b3)).bit_count()
+        if dist < best_dist:
+            best_key, best_dist = key, dist
+    if best_key is None:
+        return None
+    with _cache_lock:
+        summary = _read_summary(conn, best_key)
+    if summary is not None:
+        logging.info(f"Near-duplicate summary cache hit (hamming distance {best_dist}).")
+    return summary
+
 def cache_summary(chunk: str, summary: str, model: str, prompt_seed: str) -> None:
-    h = hashlib.sha256((chunk + model + prompt_seed).encode()).hexdigest()
-    with open(os.path.join(CACHE_DIR, f"{h}.txt"), "w", encoding="utf-8") as f:
-        f.write(summary)
-
-def load_cached_summary(chunk: str, model: str, prompt_seed: str) -> Optional[str]:
-    h = hashlib.sha256((chunk + model + prompt_seed).encode()).hexdigest()
-    path = os.path.join(CACHE_DIR, f"{h}.txt")
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
+    canon = _canon(chunk)
+    h = _cache_key(chunk, model, prompt_seed, canon=canon)
+    # SimHash bands are only needed by the fuzzy lookup; skip hashing when it is off
+    bands = _simhash_bands(_simhash(canon)) if FUZZY_CACHE else None
+    conn = _get_cache_db()
+    with _cache_lock, conn:
+        _insert_summaries(conn, [(h, summary)])
+        if bands is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO summary_simhash (key, scope, b0, b1, b2, b3) VALUES (?, ?, ?, ?, ?, ?)",
+                (h, _cache_scope(model, prompt_seed), *bands)
+            )
+        _evict_summaries(conn)
+
+def load_cached_summary(chunk: str, model: str, prompt_seed: str, fuzzy: bool = FUZZY_CACHE) -> Optional[str]:
+    keys = [_cache_key(chunk, model, prompt_seed)]
+    legacy = _legacy_cache_key(chunk, model, prompt_seed)
+    if legacy != keys[0]:
+        # Entries written before the switch to BLAKE3 are still keyed by SHA-256
+        keys.append(legacy)
+    conn = _get_cache_db()
+    with _cache_lock:
+        for h in keys:
+            summary = _read_summary(conn, h)
+            if summary is not None:
+                return summary
+    if fuzzy:
+        return _load_fuzzy_summary(chunk, model, prompt_seed)
     return None
 
 def log_api_usage(timestamp: float, model: str, prompt_tokens: int, completion_tokens: int, total_tokens: int, cost: Optional[float] = None):
@@ -147,10 +369,7 @@ def call_openai_with_retries(
     backoff_base: float = 2.0,
     log_usage: bool = True
 ) -> str:
-
-    from openai import OpenAI, RateLimitError
-    api_key = get_openai_api_key()
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client()
 
     @backoff.on_exception(backoff.expo, RateLimitError, max_tries=max_retries)
     def _call():
@@ -171,6 +390,172 @@ def call_openai_with_retries(
         logging.error(f"OpenAI API call failed after retries: {e}")
         return f"[ERROR] OpenAI API call failed: {e}"
 
+def _run_coroutine(coro):
+    """
+    Run a coroutine from sync code. Falls back to a worker thread when called from inside a running event loop (e.g. FastAPI handlers).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(asyncio.run, coro).result()
+
+async def _call_openai_async(
+    client,
+    prompt: str,
+    semaphore: asyncio.Semaphore,
+    model: str = "gpt-4",
+    max_tokens: int = 512,
+    temperature: float = 0.3,
+    max_retries: int = 5,
+    log_usage: bool = True
+) -> str:
+
+    @backoff.on_exception(backoff.expo, RateLimitError, max_tries=max_retries)
+    async def _call():
+        async with semaphore:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+        summary = response.choices[0].message.content.strip()
+        usage = getattr(response, 'usage', None)
+        if log_usage and usage:
+            logging.info(f"OpenAI API call successful. Prompt tokens: {usage.prompt_tokens}, Completion tokens: {usage.completion_tokens}")
+        return summary
+    try:
+        return await _call()
+    except Exception as e:
+        logging.error(f"OpenAI API call failed after retries: {e}")
+        return f"[ERROR] OpenAI API call failed: {e}"
+
+def _length_buckets(lengths: List[int], spread: float = 0.2) -> List[List[int]]:
+    """
+    Group indices by similar length: sorted ascending, a new bucket starts once a length exceeds the bucket's first by more than `spread`.
+    """
+    buckets: List[List[int]] = []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if buckets and lengths[i] <= lengths[buckets[-1][0]] * (1 + spread):
+            buckets[-1].append(i)
+        else:
+            buckets.append([i])
+    return buckets
+
+async def _summarize_prompts(prompts: List[str], model: str = "gpt-4", max_tokens: int = 512) -> List[str]:
+    """
+    Send all prompts concurrently (bounded by SUMMARY_CONCURRENCY). Prompts are bucketed by token length so
+    long requests don't stall batches of short ones; results keep the order of `prompts`.
+    """
+    from openai import AsyncOpenAI
+    # Tokenizing every prompt is CPU work; keep it off the event loop
+    lengths = await asyncio.to_thread(lambda: [num_tokens_from_string(p, model=model) for p in prompts])
+    buckets = _length_buckets(lengths)
+    shortest = max(1, lengths[buckets[0][0]])
+    client = AsyncOpenAI(api_key=get_openai_api_key())
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def _run(i: int, bucket_limit: asyncio.Semaphore) -> Tuple[int, str]:
+        async with bucket_limit:
+            return i, await _call_openai_async(client, prompts[i], semaphore, model=model, max_tokens=max_tokens)
+
+    calls = []
+    for bucket in buckets:
+        # Larger prompts get fewer concurrent slots
+        bucket_limit = asyncio.Semaphore(max(1, SUMMARY_CONCURRENCY * shortest // max(1, lengths[bucket[0]])))
+        calls.extend(_run(i, bucket_limit) for i in bucket)
+    try:
+        done = await asyncio.gather(*calls)
+    finally:
+        await client.close()
+    results = [""] * len(prompts)
+    for i, summary in done:
+        results[i] = summary
+    return results
+
+def _plan_summaries(
+    text: str,
+    model: str,
+    prompt_seed: str,
+    chunk_max_tokens: int,
+    overlap: int,
+    cache: bool,
+    tokenizer: Optional[Callable[[str], List[int]]]
+) -> Tuple[List[str], List[Optional[str]], List[Tuple[List[int], str]]]:
+    """Chunk text and resolve cache hits; returns (chunks, summaries so far, pending (chunk idxs, prompt))."""
+    chunks = smart_chunk_text(text, model=model, max_tokens=chunk_max_tokens, overlap=overlap, tokenizer=tokenizer)
+    # Identical chunks (after canonicalization, e.g. repeated headers/footers) are summarized once
+    groups: Dict[str, List[int]] = {}
+    for i, chunk in enumerate(chunks):
+        groups.setdefault(_canon(chunk), []).append(i)
+    summaries: List[Optional[str]] = [None] * len(chunks)
+    pending: List[Tuple[List[int], str]] = []
+    for idxs in groups.values():
+        chunk = chunks[idxs[0]]
+        cached = load_cached_summary(chunk, model, prompt_seed) if cache else None
+        if cached:
+            for i in idxs:
+                summaries[i] = cached
+            logging.info(f"Loaded cached summary for chunk {idxs[0]}")
+        else:
+            pending.append((idxs, prompt_seed.format(input=chunk)))
+    return chunks, summaries, pending
+
+def _finish_summaries(
+    chunks: List[str],
+    summaries: List[Optional[str]],
+    pending: List[Tuple[List[int], str]],
+    outputs: List[str],
+    model: str,
+    prompt_seed: str,
+    cache: bool,
+    tokenizer: Optional[Callable[[str], List[int]]]
+) -> List[Dict[str, Any]]:
+    for (idxs, _), summary in zip(pending, outputs):
+        for i in idxs:
+            summaries[i] = summary
+        if cache:
+            cache_summary(chunks[idxs[0]], summary, model, prompt_seed)
+    results = []
+    for i, chunk in enumerate(chunks):
+        results.append({
+            "chunk": i,
+            "tokens": num_tokens_from_string(chunk, tokenizer=tokenizer, model=model),
+            "summary": summaries[i],
+            "text": chunk
+        })
+    return results
+
+async def summarize_text_async(
+    text: str,
+    model: str = "gpt-4",
+    domain: str = "general",
+    custom_prompt: Optional[str] = None,
+    max_tokens: int = 512,
+    chunk_max_tokens: int = 768,
+    overlap: int = 50,
+    cache: bool = True,
+    tokenizer: Optional[Callable[[str], List[int]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Async summarize_text: cache hits are resolved first, then every uncached chunk is sent in one concurrent batch.
+    Returns a list of dicts: [{chunk, tokens, summary, text}]
+    """
+    prompt_seed = custom_prompt or get_prompt(domain)
+    # Chunking, tokenization and cache I/O are synchronous; run them in a worker thread so the event loop stays free
+    chunks, summaries, pending = await asyncio.to_thread(
+        _plan_summaries, text, model, prompt_seed, chunk_max_tokens, overlap, cache, tokenizer
+    )
+    outputs: List[str] = []
+    if pending:
+        logging.info(f"Summarizing {len(pending)} unique chunks ({len(chunks)} total).")
+        outputs = await _summarize_prompts([p for _, p in pending], model=model, max_tokens=max_tokens)
+    return await asyncio.to_thread(
+        _finish_summaries, chunks, summaries, pending, outputs, model, prompt_seed, cache, tokenizer
+    )
+
 def summarize_text(
     text: str,
     model: str = "gpt-4",
@@ -186,29 +571,19 @@ def summarize_text(
     Summarize text using OpenAI GPT-4, with hybrid chunking, caching, and metadata.
     Returns a list of dicts: [{chunk, tokens, summary, text}]
     """
-    prompt_seed = custom_prompt or get_prompt(domain)
-    chunks = smart_chunk_text(text, model=model, max_tokens=chunk_max_tokens, overlap=overlap, tokenizer=tokenizer)
-    results = []
-    for i, chunk in enumerate(chunks):
-        tokens = num_tokens_from_string(chunk, tokenizer=tokenizer, model=model)
-        cached = load_cached_summary(chunk, model, prompt_seed) if cache else None
-        if cached:
-            summary = cached
-            logging.info(f"Loaded cached summary for chunk {i}")
-        else:
-            prompt = prompt_seed.format(input=chunk)
-            summary = call_openai_with_retries(prompt, model=model, max_tokens=max_tokens)
-            if cache:
-                cache_summary(chunk, summary, model, prompt_seed)
-        results.append({
-            "chunk": i,
-            "tokens": tokens,
-            "summary": summary,
-            "text": chunk
-        })
-    return results
+    return _run_coroutine(summarize_text_async(
+        text,
+        model=model,
+        domain=domain,
+        custom_prompt=custom_prompt,
+        max_tokens=max_tokens,
+        chunk_max_tokens=chunk_max_tokens,
+        overlap=overlap,
+        cache=cache,
+        tokenizer=tokenizer
+    ))
 
-def summarize_document(
+async def summarize_document_async(
     doc: Dict[str, Any],
     mode: str = "document",  # "document", "page", or "section" (I didn't implement section)
     model: str = "gpt-4",
@@ -218,18 +593,17 @@ def summarize_document(
     chunk_max_tokens: int = 768,
     overlap: int = 50,
     cache: bool = True,
-    tokenizer: Optional[Callable[[str], List[int]]] = None
+    tokenizer: Optional[Callable[[str], List[int]]] = None,
+    text: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
-    Summarize a document (from ingestion). Mode can be 'document' (entire), 'page' (per page), or 'section' (future).
-    Returns a list of dicts with chunk metadata and summaries.
+    Async summarize_document. In 'page' mode the uncached chunks of every page go out in a single
+    concurrent batch instead of one page after another.
     """
     if mode == "document":
-        if doc.get("file_type") == "pdf":
-            text = '\n'.join(doc["text_by_page"])
-        else:
-            text = doc["text"]
-        return summarize_text(
+        if text is None:
+            text = '\n'.join(doc["text_by_page"]) if doc.get("file_type") == "pdf" else doc["text"]
+        return await summarize_text_async(
             text,
             model=model,
             domain=domain,
@@ -242,25 +616,65 @@ def summarize_document(
         )
     elif mode == "page":
         if doc.get("file_type") == "pdf":
-            results = []
-            for i, page in enumerate(doc["text_by_page"]):
-                page_results = summarize_text(
-                    page,
-                    model=model,
-                    domain=domain,
-                    custom_prompt=custom_prompt,
-                    max_tokens=max_tokens,
-                    chunk_max_tokens=chunk_max_tokens,
-                    overlap=overlap,
-                    cache=cache,
-                    tokenizer=tokenizer
-                )
-                for r in page_results:
-                    r["page"] = i
-                    r["source"] = f"{doc['file_name']} - Page {i+1}"
-                results.extend(page_results)
-            return results
+            prompt_seed = custom_prompt or get_prompt(domain)
+            # Planning and finishing are synchronous (tokenization, cache I/O); run them off the event loop
+            plans = await asyncio.to_thread(lambda: [
+                _plan_summaries(page, model, prompt_seed, chunk_max_tokens, overlap, cache, tokenizer)
+                for page in doc["text_by_page"]
+            ])
+            prompts = [p for _, _, pending in plans for _, p in pending]
+            outputs: List[str] = []
+            if prompts:
+                logging.info(f"Summarizing {len(prompts)} uncached chunks across {len(plans)} pages.")
+                outputs = await _summarize_prompts(prompts, model=model, max_tokens=max_tokens)
+
+            def finish_pages() -> List[Dict[str, Any]]:
+                results = []
+                offset = 0
+                for i, (chunks, summaries, pending) in enumerate(plans):
+                    page_outputs = outputs[offset:offset + len(pending)]
+                    offset += len(pending)
+                    page_results = _finish_summaries(chunks, summaries, pending, page_outputs, model, prompt_seed, cache, tokenizer)
+                    for r in page_results:
+                        r["page"] = i
+                        r["source"] = f"{doc['file_name']} - Page {i+1}"
+                    results.extend(page_results)
+                return results
+
+            return await asyncio.to_thread(finish_pages)
         else:
             raise ValueError("Per-page summarization is only supported for PDFs.")
     else:
-        raise ValueError(f"Unsupported summarization mode: {mode}")
\ No newline at end of file
+        raise ValueError(f"Unsupported summarization mode: {mode}")
+
+def summarize_document(
+    doc: Dict[str, Any],
+    mode: str = "document",  # "document", "page", or "section" (I didn't implement section)
+    model: str = "gpt-4",
+    domain: str = "general",
+    custom_prompt: Optional[str] = None,
+    max_tokens: int = 512,
+    chunk_max_tokens: int = 768,
+    overlap: int = 50,
+    cache: bool = True,
+    tokenizer: Optional[Callable[[str], List[int]]] = None,
+    text: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Summarize a document (from ingestion). Mode can be 'document' (entire), 'page' (per page), or 'section' (future).
+    Pass `text` to reuse an already joined document text in 'document' mode.
+    Returns a list of dicts with chunk metadata and summaries.
+    """
+    return _run_coroutine(summarize_document_async(
+        doc,
+        mode=mode,
+        model=model,
+        domain=domain,
+        custom_prompt=custom_prompt,
+        max_tokens=max_tokens,
+        chunk_max_tokens=chunk_max_tokens,
+        overlap=overlap,
+        cache=cache,
+        tokenizer=tokenizer,
+        text=text
+    ))
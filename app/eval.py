@@ -1,6 +1,11 @@
-import json
+import orjson
 import math
-from typing import List, Dict, Any, Tuple
+import numpy as np
+from typing import List, Dict, Any, Tuple, Union
+
+# Structured (SoA) view of retrieved hits at the Chroma boundary: one row per hit
+RetrievedBatch = np.dtype([("doc", object), ("page", "i4"), ("score", "f4")])
+Refs = Union[np.ndarray, List[Tuple[str, int]]]
 
 
 def normalize_ref(meta: Dict[str, Any]) -> Tuple[str, int]:
@@ -9,20 +14,46 @@ def normalize_ref(meta: Dict[str, Any]) -> Tuple[str, int]:
     return (doc, page)
 
 
-def precision_recall_at_k(retrieved: List[Tuple[str, int]], relevant: List[Tuple[str, int]], k: int = 5) -> Dict[str, float]:
-    retrieved_k = retrieved[:k]
-    rel_set = set(relevant)
-    hit = sum(1 for r in retrieved_k if r in rel_set)
+def to_retrieved_batch(system_results: List[Dict[str, Any]]) -> np.ndarray:
+    """Convert retrieved chunks (text + Chroma metadata) into a RetrievedBatch array."""
+    batch = np.empty(len(system_results), dtype=RetrievedBatch)
+    for i, r in enumerate(system_results):
+        doc, page = normalize_ref(r.get("metadata", {}))
+        score = r.get("score", r.get("distance"))
+        batch[i] = (doc, page, score if score is not None else np.nan)
+    return batch
+
+
+def _as_batch(refs: Refs) -> np.ndarray:
+    if isinstance(refs, np.ndarray):
+        return refs
+    return np.array([(doc, page, np.nan) for doc, page in refs], dtype=RetrievedBatch)
+
+
+def _ref_keys(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Pack (doc, page) into int64 keys over a shared doc vocabulary so membership tests are a single np.isin
+    docs = np.concatenate([a["doc"], b["doc"]]).astype(str)
+    _, doc_ids = np.unique(docs, return_inverse=True)
+    pages = np.concatenate([a["page"], b["page"]]).astype(np.int64) & 0xFFFFFFFF
+    keys = (doc_ids.astype(np.int64) << 32) | pages
+    return keys[:len(a)], keys[len(a):]
+
+
+def precision_recall_at_k(retrieved: Refs, relevant: Refs, k: int = 5) -> Dict[str, float]:
+    retrieved_k = _as_batch(retrieved)[:k]
+    ret_keys, rel_keys = _ref_keys(retrieved_k, _as_batch(relevant))
+    rel_keys = np.unique(rel_keys)
+    hit = int(np.isin(ret_keys, rel_keys).sum())
     precision = hit / max(1, len(retrieved_k))
-    recall = hit / max(1, len(rel_set))
+    recall = hit / max(1, len(rel_keys))
     return {"precision@k": precision, "recall@k": recall}
 
 
-def citation_accuracy(retrieved: List[Tuple[str, int]], cited: List[Tuple[str, int]]) -> float:
-    if not cited:
+def citation_accuracy(retrieved: Refs, cited: Refs) -> float:
+    if len(cited) == 0:
         return 0.0
-    ret_set = set(retrieved)
-    correct = sum(1 for c in cited if c in ret_set)
+    ret_keys, cited_keys = _ref_keys(_as_batch(retrieved), _as_batch(cited))
+    correct = int(np.isin(cited_keys, ret_keys).sum())
     return correct / len(cited)
 
 
@@ -31,7 +62,7 @@ def evaluate_single(query: str, ground_truth: Dict[str, Any], system_results: Li
     ground_truth expects keys: "relevant_refs": [{doc_name, page}], optional "cited_refs" for expected citations.
     system_results are retrieved chunks: each has text and metadata.
     """
-    retrieved_refs = [normalize_ref(r.get("metadata", {})) for r in system_results]
+    retrieved_refs = to_retrieved_batch(system_results)
     relevant_refs = [(g.get("doc_name"), int(g.get("page", 0))) for g in ground_truth.get("relevant_refs", [])]
     metrics = precision_recall_at_k(retrieved_refs, relevant_refs, k=k)
     expected_cites = [(c.get("doc_name"), int(c.get("page", 0))) for c in ground_truth.get("cited_refs", [])]
@@ -42,18 +73,18 @@ def evaluate_single(query: str, ground_truth: Dict[str, Any], system_results: Li
 
 def load_jsonl(path: str) -> List[Dict[str, Any]]:
     rows = []
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            rows.append(json.loads(line))
+            rows.append(orjson.loads(line))
     return rows
 
 
 def save_jsonl(path: str, rows: List[Dict[str, Any]]):
-    with open(path, "w", encoding="utf-8") as f:
+    with open(path, "wb") as f:
         for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            f.write(orjson.dumps(r) + b"\n")
 
 
@@ -1,18 +1,21 @@
+import hashlib
+import multiprocessing
 import os
-from typing import List, Dict, Any, Optional, Union
+import pickle
+import subprocess
+import tempfile
+from typing import Iterator, List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 from PIL import Image
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache, partial
 
 try:
     import pytesseract
 except ImportError:
     pytesseract = None
-try:
-    import PyPDF2
-except ImportError:
-    PyPDF2 = None
 try:
     import docx
 except ImportError:
@@ -24,20 +27,57 @@ except ImportError:
     fitz = None
 try:
     from langdetect import detect
+    from langdetect import detector_factory as _ld_factory
 except ImportError:
     detect = None
+    _ld_factory = None
 
 logging.basicConfig(level=logging.INFO)
 
+# langdetect loads all 55 n-gram profiles by default; keep the languages we expect
+# (plus the DeepL ones in translator.LANG_NORMALIZATION) to cut its memory and load time
+LANGDETECT_LANGUAGES = frozenset({
+    "en", "es", "fr", "de", "it", "pt", "nl", "ru", "ja", "ko", "zh-cn", "zh-tw", "ar", "hi", "id",
+    "sv", "fi", "da", "no", "pl", "tr",
+})
+
+def _init_langdetect_factory():
+    if _ld_factory._factory is not None:
+        return
+    profiles = []
+    for lang in sorted(LANGDETECT_LANGUAGES):
+        with open(os.path.join(_ld_factory.PROFILES_DIRECTORY, lang), 'r', encoding='utf-8') as f:
+            profiles.append(f.read())
+    factory = _ld_factory.DetectorFactory()
+    factory.load_json_profile(profiles)
+    _ld_factory._factory = factory
+
+if _ld_factory is not None:
+    # langdetect.detect() calls init_factory() lazily; route it to the subset loader
+    _ld_factory.init_factory = _init_langdetect_factory
+
+# Page extraction/OCR is CPU-bound; small PDFs stay in-process to skip worker startup
+PDF_MAX_WORKERS = min(os.cpu_count() or 1, 4)
+PDF_PARALLEL_MIN_PAGES = 8
+# Workers must not be forked from the threaded API process (held locks would be copied into the children)
+PDF_MP_CONTEXT = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Concurrent Tesseract processes per window, each pinned to one OpenMP thread
+OCR_MAX_WORKERS = min(os.cpu_count() or 1, 4)
+# Pages are extracted/OCR'd this many at a time
+PDF_PAGE_WINDOW = 32
+INGEST_CACHE_DIR = os.path.join('cache', 'ingest')
+
 def extract_images_from_pdf_page(file_path: str, page_num: int) -> List[Image.Image]:
     """
     Extract images from a PDF page using fitz (PyMuPDF). Returns a list of PIL Images.
     """
     if fitz is None:
         raise ImportError("PyMuPDF (fitz) is required for image extraction from PDFs. Please install it.")
+    with fitz.open(file_path) as doc:
+        return _extract_images_from_page(doc, doc[page_num])
+
+def _extract_images_from_page(doc, page) -> List[Image.Image]:
     images = []
-    doc = fitz.open(file_path)
-    page = doc[page_num]
     for img_index, img in enumerate(page.get_images(full=True)):
         xref = img[0]
         pix = fitz.Pixmap(doc, xref)
@@ -59,55 +99,165 @@ def detect_language(text: str, override: Optional[str] = None) -> str:
         return override
     if detect is None:
         return 'eng'  # Default to English if langdetect is not available
+    # Language is stable over a short prefix, and repeated headers/boilerplate pages hit the cache
+    return _detect_cached(text[:512])
+
+@lru_cache(maxsize=1024)
+def _detect_cached(prefix: str) -> str:
     try:
-        lang = detect(text)
+        lang = detect(prefix)
         # Map langdetect codes to Tesseract codes if needed
         return lang
     except Exception as e:
         logging.warning(f"Language detection failed: {e}")
         return 'eng'
 
-def extract_text_from_pdf(file_path: str, language_hint: Optional[str] = None) -> Dict[str, Any]:
-    if PyPDF2 is None:
-        raise ImportError("PyPDF2 is required for PDF processing. Please install it.")
+@lru_cache(maxsize=1)
+def _open_worker_pdf(file_path: str):
+    # Each pool worker parses the PDF once and reuses it for every page it is handed
+    return fitz.open(file_path)
+
+def _page_text(doc, i: int, language_hint: Optional[str]) -> Tuple[str, bool, Optional[str]]:
+    """Return (text, needs_ocr, lang) for one page."""
+    try:
+        text = doc[i].get_text("text") or ''
+    except Exception as e:
+        logging.error(f"Error extracting text from page {i}: {str(e)}")
+        text = ''
+    if text.strip():
+        return text, False, detect_language(text, language_hint)
+    return '', True, None
+
+def _extract_png_images_from_page(doc, page) -> List[bytes]:
+    # PNG-encode straight from the Pixmap; no PIL copy or re-encode on the OCR path
+    pngs = []
+    for img in page.get_images(full=True):
+        pix = fitz.Pixmap(doc, img[0])
+        if pix.n - pix.alpha >= 4:
+            # PNG has no CMYK: convert to RGB first
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        pngs.append(pix.tobytes("png"))
+    return pngs
+
+def _page_image_paths(doc, i: int, out_dir: str) -> List[str]:
+    """Save a page's images as PNGs under out_dir for batch OCR; returns their paths."""
+    try:
+        pngs = _extract_png_images_from_page(doc, doc[i])
+    except Exception as e:
+        logging.error(f"Error extracting images from page {i}: {str(e)}")
+        pngs = []
+    paths = []
+    for k, png in enumerate(pngs):
+        path = os.path.join(out_dir, f"p{i:05d}_{k}.png")
+        with open(path, 'wb') as f:
+            f.write(png)
+        paths.append(path)
+    return paths
+
+def _ocr_batch(image_paths: List[str], lang: str, list_path: str) -> List[str]:
+    """
+    OCR many images with a single Tesseract process (model load + startup paid once).
+    Tesseract reads the image list file and separates per-image output with form feeds.
+    """
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(image_paths) + '\n')
+    try:
+        proc = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, list_path, "stdout", "-l", lang],
+            capture_output=True,
+            env={**os.environ, "OMP_THREAD_LIMIT": "1"}
+        )
+    except OSError as e:
+        logging.error(f"OCR failed to start Tesseract: {str(e)}")
+        return [''] * len(image_paths)
+    if proc.returncode != 0:
+        logging.error(f"OCR failed ({lang}): {proc.stderr.decode('utf-8', errors='replace').strip()}")
+        return [''] * len(image_paths)
+    texts = proc.stdout.decode('utf-8', errors='replace').split('\f')
+    if len(texts) < len(image_paths):
+        logging.error(f"OCR returned {len(texts)} results for {len(image_paths)} images ({lang}).")
+    return (texts + [''] * len(image_paths))[:len(image_paths)]
+
+def _process_page(file_path: str, i: int, language_hint: Optional[str] = None) -> Tuple[str, bool, Optional[str]]:
+    return _page_text(_open_worker_pdf(file_path), i, language_hint)
+
+def _save_page_images(file_path: str, out_dir: str, i: int) -> List[str]:
+    return _page_image_paths(_open_worker_pdf(file_path), i, out_dir)
+
+def _process_window(doc, ex, file_path: str, idxs: List[int], language_hint: Optional[str], lang: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Extract/OCR one window of pages; `lang` is the language carried over from earlier pages."""
+    # Pass 1: text layer + language per page
+    if ex:
+        pages = list(ex.map(partial(_process_page, file_path, language_hint=language_hint), idxs, chunksize=4))
+    else:
+        pages = [_page_text(doc, i, language_hint) for i in idxs]
+    # Scanned pages are OCR'd with the language of the closest preceding text page
+    rows = []
+    for i, (text, needs_ocr, page_lang) in zip(idxs, pages):
+        if not needs_ocr:
+            lang = page_lang
+        rows.append({'page': i, 'text': text, 'ocr': needs_ocr, 'lang': lang})
+    ocr_rows = [row for row in rows if row['ocr']]
+    # Pass 2: dump scanned page images, then OCR them in one Tesseract call per language
+    if ocr_rows:
+        with tempfile.TemporaryDirectory(prefix="ocr_") as work_dir:
+            ocr_idxs = [row['page'] for row in ocr_rows]
+            if ex:
+                page_paths = list(ex.map(partial(_save_page_images, file_path, work_dir), ocr_idxs))
+            else:
+                page_paths = [_page_image_paths(doc, i, work_dir) for i in ocr_idxs]
+            batches: Dict[str, List[Tuple[Dict[str, Any], str]]] = {}
+            for row, paths in zip(ocr_rows, page_paths):
+                batches.setdefault(row['lang'], []).extend((row, path) for path in paths)
+            # Split each language's images into contiguous shards and run one Tesseract per shard
+            # concurrently (threads suffice: the work happens in the subprocesses)
+            shards: List[Tuple[str, List[Tuple[Dict[str, Any], str]]]] = []
+            for batch_lang, items in batches.items():
+                n = min(OCR_MAX_WORKERS, len(items))
+                size = -(-len(items) // n)
+                shards.extend((batch_lang, items[k:k + size]) for k in range(0, len(items), size))
+            def run_shard(k: int) -> List[str]:
+                shard_lang, items = shards[k]
+                return _ocr_batch([path for _, path in items], shard_lang, os.path.join(work_dir, f"images_{k}.txt"))
+            with ThreadPoolExecutor(max_workers=max(1, min(OCR_MAX_WORKERS, len(shards)))) as ocr_ex:
+                shard_texts = list(ocr_ex.map(run_shard, range(len(shards))))
+            ocr_by_page: Dict[int, List[str]] = {}
+            for (_, items), texts in zip(shards, shard_texts):
+                for (row, _), text in zip(items, texts):
+                    ocr_by_page.setdefault(row['page'], []).append(text)
+            for row in ocr_rows:
+                row['text'] = ''.join(t + '\n' for t in ocr_by_page.get(row['page'], [])).strip()
+    return rows, lang
+
+def iter_pdf_pages(file_path: str, language_hint: Optional[str] = None, window: int = PDF_PAGE_WINDOW) -> Iterator[Dict[str, Any]]:
+    """
+    Yield {page, text, ocr, lang} per PDF page, extracting/OCR'ing `window` pages at a time.
+    The window bounds the OCR temp images and pending pool results; callers that collect every
+    page (extract_text_from_pdf) still hold the whole document's text.
+    """
+    if fitz is None:
+        raise ImportError("PyMuPDF (fitz) is required for PDF processing. Please install it.")
     if pytesseract is None:
         raise ImportError("pytesseract is required for OCR. Please install it.")
+    doc = fitz.open(file_path)
+    n_pages = doc.page_count
+    ex = ProcessPoolExecutor(max_workers=PDF_MAX_WORKERS, mp_context=multiprocessing.get_context(PDF_MP_CONTEXT)) if n_pages >= PDF_PARALLEL_MIN_PAGES and PDF_MAX_WORKERS > 1 else None
+    lang = language_hint or 'eng'
+    try:
+        for start in range(0, n_pages, window):
+            rows, lang = _process_window(doc, ex, file_path, list(range(start, min(start + window, n_pages))), language_hint, lang)
+            yield from rows
+    finally:
+        if ex:
+            ex.shutdown()
+        doc.close()
+
+def extract_text_from_pdf(file_path: str, language_hint: Optional[str] = None) -> Dict[str, Any]:
     text_by_page: List[str] = []
     ocr_pages: List[bool] = []
-    lang_by_page: List[str] = []
-    with open(file_path, 'rb') as f:
-        reader = PyPDF2.PdfReader(f)
-        for i, page in enumerate(reader.pages):
-            try:
-                text = page.extract_text() or ''
-            except Exception as e:
-                logging.error(f"Error extracting text from page {i}: {str(e)}")
-                text = ''
-            if text.strip():
-                text_by_page.append(text)
-                ocr_pages.append(False)
-                lang_by_page.append(detect_language(text, language_hint))
-            else:
-                try:
-                    images = extract_images_from_pdf_page(file_path, i)
-                except Exception as e:
-                    logging.error(f"Error extracting images from page {i}: {str(e)}")
-                    images = []
-                ocr_text = ''
-                lang = language_hint or 'eng'
-                if images:
-                    # Try to detect language from previous text or fallback
-                    if len(text_by_page) > 0:
-                        lang = lang_by_page[-1]
-                    for img in images:
-                        try:
-                            ocr_result = pytesseract.image_to_string(img, lang=lang)
-                            ocr_text += ocr_result + '\n'
-                        except Exception as e:
-                            logging.error(f"OCR failed on page {i}: {str(e)}")
-                    lang_by_page.append(lang)
-                text_by_page.append(ocr_text.strip())
-                ocr_pages.append(True)
+    for row in iter_pdf_pages(file_path, language_hint=language_hint):
+        text_by_page.append(row['text'])
+        ocr_pages.append(row['ocr'])
     meta = os.stat(file_path)
     return {
         'text_by_page': text_by_page,
@@ -140,7 +290,8 @@ def extract_text_from_docx(file_path: str) -> Dict[str, Any]:
 
 def extract_text_from_txt(file_path: str) -> Dict[str, Any]:
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        # Undecodable bytes become U+FFFD instead of failing the whole file
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
             text = f.read()
     except Exception as e:
         logging.error(f"Error reading TXT file: {str(e)}")
@@ -169,3 +320,31 @@ def ingest_document(file_path: str, language_hint: Optional[str] = None) -> Dict
         return extract_text_from_txt(file_path)
     else:
         raise ValueError(f"Unsupported file type: {ext}")
+
+@lru_cache(maxsize=32)
+def _ingest_cached(key: str, file_path: str, language_hint: Optional[str]) -> Dict[str, Any]:
+    cache_path = os.path.join(INGEST_CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pkl')
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable ingest cache entry {cache_path}: {e}")
+    doc = ingest_document(file_path, language_hint=language_hint)
+    os.makedirs(INGEST_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(doc, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return doc
+
+def ingest_document_cached(file_path: str, language_hint: Optional[str] = None) -> Dict[str, Any]:
+    """
+    ingest_document with an in-process LRU and a pickle cache under cache/ingest/.
+    Entries are keyed on (path, mtime, size, language_hint), so editing the file invalidates them.
+    """
+    st = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}:{st.st_mtime_ns}:{st.st_size}:{language_hint}"
+    # Shallow copy so callers adding keys don't alter the cached dict
+    return dict(_ingest_cached(key, file_path, language_hint))
@@ -0,0 +1,29 @@
+import os
+from functools import lru_cache
+
+import httpx
+from openai import OpenAI
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+def get_openai_api_key() -> str:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise EnvironmentError("OPENAI_API_KEY not set. Please set your OpenAI API key.")
+    return api_key
+
+@lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """
+    Process-wide OpenAI client shared by summaries, embeddings and QA: one httpx connection pool
+    (HTTP/2 when h2 is installed, so concurrent calls multiplex over one TLS connection).
+    """
+    return OpenAI(
+        api_key=get_openai_api_key(),
+        http_client=httpx.Client(limits=httpx.Limits(max_connections=64, max_keepalive_connections=32), http2=HTTP2)
+    )
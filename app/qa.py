@@ -1,7 +1,12 @@
-from typing import List, Dict, Any, Tuple
-from openai import OpenAI
+from typing import List, Dict, Any, Optional, Tuple
 import logging
-from app.embeddings import get_openai_api_key
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+
+import numpy as np
+from app.openai_client import get_client as get_openai_client
 
 
 def answer_query(query: str, retrieved_chunks: List[Dict[str, Any]], model: str = "gpt-3.5-turbo", max_tokens: int = 512, chat_history: list = None) -> str:
@@ -37,20 +42,82 @@ Question:
 
 Answer:"""
     try:
-        api_key = get_openai_api_key()
-        client = OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=0.2,
-        )
-        return response.choices[0].message.content.strip()
+        return _cached_completion(prompt, model, max_tokens)
     except Exception as e:
         logging.error(f"OpenAI QA call failed: {e}")
         return f"[Error] {e}" 
 
 
+@lru_cache(maxsize=256)
+def _cached_completion(prompt: str, model: str, max_tokens: int) -> str:
+    # Re-asked questions (same context, history and question) skip the API; failures raise and aren't cached
+    client = get_openai_client()
+    response = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        temperature=0.2,
+    )
+    return response.choices[0].message.content.strip()
+
+
+QA_CACHE_DB = os.path.join('cache', 'qa_cache.sqlite')
+
+
+class SemanticQACache:
+    """
+    Two-tier answer cache: exact match on the normalized query, then cosine similarity of the
+    query embedding against earlier queries in the same scope (e.g. document + embedding model).
+    """
+    def __init__(self, db_path: str = QA_CACHE_DB, threshold: float = 0.95):
+        self.threshold = threshold
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS qa_cache "
+            "(id INTEGER PRIMARY KEY, scope TEXT NOT NULL, query_norm TEXT NOT NULL, query TEXT NOT NULL, emb BLOB NOT NULL, answer TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_qa_cache_query ON qa_cache (scope, query_norm)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def get_exact(self, scope: str, query: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer FROM qa_cache WHERE scope = ? AND query_norm = ? ORDER BY id DESC LIMIT 1",
+                (scope, self._normalize(query))
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_similar(self, scope: str, query_emb: Any) -> Optional[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT emb, answer FROM qa_cache WHERE scope = ?", (scope,)).fetchall()
+        if not rows:
+            return None
+        q = np.asarray(query_emb, dtype=np.float32)
+        embs = np.stack([np.frombuffer(emb, dtype=np.float32) for emb, _ in rows])
+        sims = embs @ q / np.maximum(np.linalg.norm(embs, axis=1) * np.linalg.norm(q), 1e-12)
+        best = int(np.argmax(sims))
+        if sims[best] > self.threshold:
+            logging.info(f"Semantic QA cache hit (cosine {sims[best]:.3f}).")
+            return rows[best][1]
+        return None
+
+    def put(self, scope: str, query: str, query_emb: Any, answer: str) -> None:
+        if answer.startswith("[Error]"):
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO qa_cache (scope, query_norm, query, emb, answer) VALUES (?, ?, ?, ?, ?)",
+                (scope, self._normalize(query), query, np.asarray(query_emb, dtype=np.float32).tobytes(), answer)
+            )
+
+
 def _short_snippet(text: str, max_len: int = 160) -> str:
     if not text:
         return ""
@@ -1,49 +1,116 @@
 import os
 import time
 import uuid
-from typing import List, Dict, Any, Optional, Union
+import hashlib
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple, Union
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
 
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
-from chromadb.api.types import Documents, Embeddings, Metadatas
+import numpy as np
+from openai import RateLimitError
 
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI, RateLimitError
-import nltk
-from nltk.tokenize import word_tokenize
+import string
 
-import re
+from app.openai_client import get_client as get_openai_client
 
-# Ensure NLTK 'punkt' is available
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+# chromadb, sentence_transformers and torch are imported where first used: they dominate import
+# time and aren't needed by every code path that imports this module
+if TYPE_CHECKING:
+    import chromadb
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
 CHROMA_DB_DIR = './db'
 CHROMA_COLLECTION = 'doc_chunks'
+# HNSW index settings for new collections; cosine space so distances read as 1 - cosine similarity
+CHROMA_HNSW_METADATA = {"hnsw:space": "cosine", "hnsw:construction_ef": 200, "hnsw:M": 32, "hnsw:search_ef": 64}
+# Concurrent OpenAI embedding requests (I/O-bound)
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "8"))
+EMBEDDING_CACHE_DB = os.path.join('cache', 'embeddings.sqlite')
+# Summed input tokens per OpenAI embedding request; the API rejects requests over 300k tokens
+EMBED_MAX_BATCH_TOKENS = 250_000
+
+# Punctuation deleted by normalize_text: ASCII plus common Unicode quotes, dashes and CJK/Spanish marks
+_PUNCT_TBL = str.maketrans("", "", string.punctuation + "“”‘’«»„‚‹›–—…•·¿¡。，、！？：；（）「」『』【】")
+
+@lru_cache(maxsize=1)
+def _embedding_encoding():
+    # text-embedding-3-* use cl100k_base; None when tiktoken or its encoding file is unavailable
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logging.warning(f"cl100k_base unavailable, bounding embedding batches by UTF-8 bytes: {e}")
+        return None
+
+def _token_batches(texts: List[str], max_items: int, max_tokens: int = EMBED_MAX_BATCH_TOKENS) -> List[Tuple[int, int]]:
+    """
+    Split `texts` into contiguous (start, end) ranges of at most `max_items` inputs and `max_tokens` summed tokens.
+    Without the tokenizer, UTF-8 byte length (never below the token count) is used instead.
+    """
+    enc = _embedding_encoding()
+    counts = [len(ids) for ids in enc.encode_ordinary_batch(texts)] if enc is not None else [len(t.encode('utf-8')) for t in texts]
+    ranges = []
+    start, total = 0, 0
+    for i, n in enumerate(counts):
+        if i > start and (i - start >= max_items or total + n > max_tokens):
+            ranges.append((start, i))
+            start, total = i, 0
+        total += n
+    if start < len(texts):
+        ranges.append((start, len(texts)))
+    return ranges
 
 # --- Embedding Model Setup ---
 class EmbeddingModel:
-    def __init__(self, model_name: str = 'openai', openai_model: str = 'text-embedding-3-small', st_model: str = 'all-MiniLM-L6-v2'):
+    def __init__(self, model_name: str = 'openai', openai_model: str = 'text-embedding-3-small', st_model: str = 'all-MiniLM-L6-v2', precision: str = 'auto'):
+        """
+        `precision` applies to SentenceTransformers only: 'auto' (fp16 on CUDA, fp32 on CPU), 'fp32', 'fp16',
+        or 'int8' (quantized ONNX model on CPU; needs optimum[onnxruntime]).
+        """
+        if precision not in ('auto', 'fp32', 'fp16', 'int8'):
+            raise ValueError(f"Unknown precision: {precision}")
         self.model_name = model_name
         self.openai_model = openai_model
         self.st_model = st_model
+        self.precision = precision
         self.st_embedder = None
         self.name = f"{model_name}:{openai_model if model_name == 'openai' else st_model}"
         if model_name == 'sentence-transformers':
-            self.st_embedder = SentenceTransformer(st_model)
+            from sentence_transformers import SentenceTransformer
+            try:
+                import torch
+            except ImportError:
+                torch = None
+            device = "cuda" if torch is not None and torch.cuda.is_available() else "cpu"
+            if precision == 'int8' and device == "cpu":
+                self.st_embedder = self._load_int8(SentenceTransformer, st_model)
+                if self.st_embedder is not None:
+                    # Quantized vectors differ slightly; keep them apart in the embedding caches
+                    self.name += "@int8"
+            if self.st_embedder is None:
+                self.st_embedder = SentenceTransformer(st_model, device=device)
+                if device == "cuda" and precision in ('auto', 'fp16', 'int8'):
+                    # FP16 halves weight/activation bandwidth; CPU kernels stay FP32
+                    self.st_embedder.half()
 
-    def embed(self, texts: List[str], log_tokens: bool = True, max_retries: int = 5) -> List[List[float]]:
+    @staticmethod
+    def _load_int8(factory: Any, st_model: str) -> Any:
+        # Int8 ONNX export (VNNI kernels) published alongside the sentence-transformers hub models
+        try:
+            return factory(st_model, device="cpu", backend="onnx", model_kwargs={"file_name": "onnx/model_qint8_avx512_vnni.onnx"})
+        except Exception as e:
+            logging.warning(f"Int8 ONNX model unavailable for {st_model}, using fp32: {e}")
+            return None
+
+    def embed(self, texts: List[str], log_tokens: bool = True, max_retries: int = 5) -> Union[List[List[float]], np.ndarray]:
         if self.model_name == 'openai':
-            api_key = os.getenv('OPENAI_API_KEY')
-            client = OpenAI(api_key=api_key)
+            client = get_openai_client()
             for attempt in range(max_retries):
                 try:
                     response = client.embeddings.create(
@@ -65,10 +132,85 @@ class EmbeddingModel:
                     else:
                         raise
         elif self.model_name == 'sentence-transformers':
-            return self.st_embedder.encode(texts, show_progress_bar=False, convert_to_numpy=False).tolist()
+            # Unit-length vectors (OpenAI embeddings already are) so cosine distance is a plain inner product
+            # Chroma takes float32 arrays directly, so skip the per-float list conversion
+            embeddings = self.st_embedder.encode(texts, batch_size=64, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True)
+            return embeddings.astype(np.float32, copy=False)
         else:
             raise ValueError(f"Unknown embedding model: {self.model_name}")
 
+    def embed_batch(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        """
+        Embed a whole list into an (n, dim) float32 array aligned with `texts`.
+        OpenAI gets one request per `batch_size` inputs (fewer if they would exceed EMBED_MAX_BATCH_TOKENS);
+        SentenceTransformers encodes the list in one call.
+        """
+        if self.model_name == 'sentence-transformers':
+            return self.embed(texts)
+        parts = [np.asarray(self.embed(texts[lo:hi]), dtype=np.float32) for lo, hi in _token_batches(texts, batch_size)]
+        return np.concatenate(parts) if parts else np.empty((0, 0), dtype=np.float32)
+
+class CachedEmbeddingModel:
+    """
+    Wraps an EmbeddingModel with a persistent SQLite cache keyed on (sha256(text), provider, model),
+    so unchanged chunks are never re-embedded across runs. Vectors are stored as float16 blobs;
+    only cache misses reach the wrapped model.
+    """
+    def __init__(self, inner: EmbeddingModel, db_path: str = EMBEDDING_CACHE_DB):
+        self.inner = inner
+        self.model_name = inner.model_name
+        self.name = inner.name
+        self.provider, _, self.model = inner.name.partition(':')
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache "
+            "(hash TEXT NOT NULL, provider TEXT NOT NULL, model TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (hash, provider, model))"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay under SQLite's host-parameter limit
+            for i in range(0, len(unique), 500):
+                part = unique[i:i+500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embedding_cache WHERE provider = ? AND model = ? AND hash IN ({','.join('?' * len(part))})",
+                    (self.provider, self.model, *part)
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+        return found
+
+    def _embed_cached(self, texts: List[str], embed_fn: Any) -> np.ndarray:
+        hashes = [hashlib.sha256(t.encode('utf-8')).hexdigest() for t in texts]
+        found = self._lookup(hashes)
+        misses = {h: t for h, t in zip(hashes, texts) if h not in found}
+        logging.info(f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} to embed.")
+        if misses:
+            vectors = np.asarray(embed_fn(list(misses.values())), dtype=np.float32)
+            rows = [(h, self.provider, self.model, v.astype(np.float16).tobytes()) for h, v in zip(misses, vectors)]
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO embedding_cache (hash, provider, model, vector) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING",
+                    rows
+                )
+            found.update(zip(misses, vectors))
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([found[h] for h in hashes])
+
+    def embed(self, texts: List[str], **kwargs) -> np.ndarray:
+        return self._embed_cached(texts, lambda batch: self.inner.embed(batch, **kwargs))
+
+    def embed_batch(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        return self._embed_cached(texts, lambda batch: self.inner.embed_batch(batch, batch_size=batch_size))
+
 class MockEmbeddingModel:
     name = "mock"
     def embed(self, texts, **kwargs):
@@ -76,7 +218,12 @@ class MockEmbeddingModel:
         return [[0.1] * 384 for _ in texts]
 
 # --- ChromaDB Setup ---
-def get_chroma_client(persist_dir: str = CHROMA_DB_DIR, namespace: Optional[str] = None) -> chromadb.Client:
+# Client and collection handles are cached per process; call .cache_clear() on both after
+# deleting a collection or dataset directory
+@lru_cache(maxsize=8)
+def get_chroma_client(persist_dir: str = CHROMA_DB_DIR, namespace: Optional[str] = None) -> "chromadb.Client":
+    import chromadb
+    from chromadb.config import Settings
     db_dir = os.path.join(persist_dir, namespace) if namespace else persist_dir
     os.makedirs(db_dir, exist_ok=True)
     return chromadb.Client(Settings(
@@ -84,89 +231,118 @@ def get_chroma_client(persist_dir: str = CHROMA_DB_DIR, namespace: Optional[str]
         anonymized_telemetry=False
     ))
 
-def get_or_create_collection(client: chromadb.Client, name: str = CHROMA_COLLECTION) -> chromadb.Collection:
-    if name in [c.name for c in client.list_collections()]:
-        logging.info(f"Retrieved ChromaDB collection: {name}")
-        return client.get_collection(name)
-    logging.info(f"Created new ChromaDB collection: {name}")
-    return client.create_collection(name)
+@lru_cache(maxsize=16)
+def get_or_create_collection(client: "chromadb.Client", name: str = CHROMA_COLLECTION) -> "chromadb.Collection":
+    # HNSW metadata only applies when the collection is created
+    logging.info(f"Opened ChromaDB collection: {name}")
+    return client.get_or_create_collection(name, metadata=CHROMA_HNSW_METADATA)
 
 # --- Embedding and Indexing ---
 def embed_chunks(
-    chunks: List[Dict[str, Any]],
+    chunks: Union[List[Dict[str, Any]], Dict[str, List[Any]]],
     embedding_model: EmbeddingModel,
-    client: Optional[chromadb.Client] = None,
+    client: Optional["chromadb.Client"] = None,
     collection_name: str = CHROMA_COLLECTION,
-    batch_size: int = 32,
+    batch_size: int = 200,
+    embed_batch_size: int = 256,
     reembed: bool = False,
     dry_run: bool = False
 ) -> None:
     """
-    Embed and index chunks in ChromaDB. Each chunk should have 'text' and metadata.
+    Embed and index chunks in ChromaDB. `chunks` is either the columns returned by prepare_chunks_for_embedding
+    or a list of chunk dicts with 'text' and metadata.
+    A dry run only reports how many chunks were prepared; it never opens Chroma or calls the embedding model.
     """
+    # Columns from prepare_chunks_for_embedding go straight to Chroma; raw chunk dicts are converted here
+    cols = chunks if isinstance(chunks, dict) else _chunk_columns(chunks)
+    ids, docs, metas = cols['ids'], cols['documents'], cols['metadatas']
+    if dry_run:
+        logging.info(f"[DRY RUN] Would embed up to {len(ids)} chunks (existing ids not checked).")
+        return
     if client is None:
         client = get_chroma_client()
     collection = get_or_create_collection(client, collection_name)
-    ids = []
-    docs = []
-    metas = []
-    all_ids = []
-    for chunk in chunks:
-        # Deterministic chunk id to avoid duplicate re-indexing across runs
-        chunk_id = chunk.get('chunk_id') or f"{chunk.get('doc_name','doc')}-{int(chunk.get('page',0))}-{int(chunk.get('chunk',0))}"
-        all_ids.append(chunk_id)
-        ids.append(chunk_id)
-        docs.append(chunk['text'])
-        meta = {k: v for k, v in chunk.items() if k != 'text'}
-        meta['chunk_id'] = chunk_id
-        if 'source' not in meta:
-            meta['source'] = chunk.get('source', f"{chunk.get('doc_name','doc')} - Page {chunk.get('page',0)}")
-        if 'timestamp' not in meta:
-            meta['timestamp'] = chunk.get('timestamp', datetime.utcnow().isoformat())
-        if 'uuid' not in meta:
-            meta['uuid'] = str(uuid.uuid4())
-        metas.append(meta)
     # Optionally skip already embedded chunks
     if not reembed:
-        existing = set(collection.get(ids=ids).get('ids', []))
+        # Only ids are needed: page the lookup and skip documents/metadatas/embeddings
+        existing = set()
+        for start in range(0, len(ids), 1000):
+            existing.update(collection.get(ids=ids[start:start+1000], include=[]).get('ids', []))
         new_ids, new_docs, new_metas = [], [], []
-        for i, cid in enumerate(ids):
+        for cid, doc, meta in zip(ids, docs, metas):
             if cid not in existing:
                 new_ids.append(cid)
-                new_docs.append(docs[i])
-                new_metas.append(metas[i])
-        logging.info(f"Skipped {len(all_ids) - len(new_ids)} existing chunks. Embedding {len(new_ids)} new ones.")
+                new_docs.append(doc)
+                new_metas.append(meta)
+        logging.info(f"Skipped {len(ids) - len(new_ids)} existing chunks. Embedding {len(new_ids)} new ones.")
         ids, docs, metas = new_ids, new_docs, new_metas
-    if dry_run:
-        logging.info(f"[DRY RUN] Would embed {len(ids)} chunks.")
-        return
-    # Batch embedding
-    for i in range(0, len(docs), batch_size):
-        batch_docs = docs[i:i+batch_size]
-        batch_ids = ids[i:i+batch_size]
-        batch_metas = metas[i:i+batch_size]
-        if not batch_docs:
-            continue
-        embeddings = embedding_model.embed(batch_docs)
-        collection.add(
-            documents=batch_docs,
-            embeddings=embeddings,
-            metadatas=batch_metas,
-            ids=batch_ids
-        )
-        logging.info(f"Embedded and stored {len(batch_docs)} chunks in ChromaDB.")
+    write = collection.upsert if reembed else collection.add
+
+    def store(start: int, embeddings: Any) -> None:
+        # Chroma writes stay on this thread in batches of `batch_size`
+        for j in range(0, len(embeddings), batch_size):
+            lo, hi = start + j, start + min(j + batch_size, len(embeddings))
+            write(
+                documents=docs[lo:hi],
+                embeddings=embeddings[j:j+batch_size],
+                metadatas=metas[lo:hi],
+                ids=ids[lo:hi]
+            )
+            logging.info(f"Embedded and stored {hi - lo} chunks in ChromaDB.")
+
+    if getattr(embedding_model, 'model_name', None) == 'openai':
+        # Embed in large requests, capped by both input count and summed tokens (over-long OCR chunks
+        # would otherwise push a request past the API's per-request token limit), several in flight at once
+        with ThreadPoolExecutor(max_workers=EMBED_MAX_WORKERS) as ex:
+            futures = {ex.submit(embedding_model.embed, docs[lo:hi]): lo for lo, hi in _token_batches(docs, embed_batch_size)}
+            for future in as_completed(futures):
+                store(futures[future], future.result())
+    elif docs:
+        # Local models encode the whole list in one call (batched internally)
+        embed_all = getattr(embedding_model, 'embed_batch', embedding_model.embed)
+        store(0, embed_all(docs))
     # client.persist()  # Removed: not needed in latest ChromaDB
 
 # --- Retrieval ---
+def topk_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k lowest scores in ascending order: argpartition, then sort only the selected k.
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    idx = np.argpartition(scores, k - 1)[:k] if k < n else np.arange(n)
+    return idx[np.argsort(scores[idx], kind="stable")]
+
 def normalize_text(text: str) -> List[str]:
-    # Lowercase, remove punctuation, tokenize
-    text = re.sub(r'[^\w\s]', '', text.lower())
-    return word_tokenize(text)
+    # Lowercase, strip punctuation (one C-level translate pass), split on whitespace
+    return text.lower().translate(_PUNCT_TBL).split()
+
+# Repeated chat queries reuse their embedding and tokens; models are keyed by EmbeddingModel.name
+_query_models: Dict[str, Any] = {}
+
+@lru_cache(maxsize=512)
+def _embed_query_cached(model_key: str, query: str) -> np.ndarray:
+    emb = np.asarray(_query_models[model_key].embed([query])[0], dtype=np.float32)
+    emb.setflags(write=False)
+    return emb
+
+def _embed_query(embedding_model: EmbeddingModel, query: str) -> Any:
+    model_key = getattr(embedding_model, 'name', None)
+    if model_key is None:
+        return embedding_model.embed([query])[0]
+    _query_models[model_key] = embedding_model
+    return _embed_query_cached(model_key, query)
+
+@lru_cache(maxsize=512)
+def _query_tokens(query: str) -> frozenset:
+    return frozenset(normalize_text(query))
 
 def retrieve_relevant_chunks(
     query: str,
     embedding_model: EmbeddingModel,
-    client: Optional[chromadb.Client] = None,
+    client: Optional["chromadb.Client"] = None,
     collection_name: str = CHROMA_COLLECTION,
     top_k: int = 5,
     hybrid: bool = True,
@@ -183,25 +359,113 @@ def retrieve_relevant_chunks(
         client = get_chroma_client()
     collection = get_or_create_collection(client, collection_name)
     # Semantic search
-    query_emb = embedding_model.embed([query])[0]
+    query_emb = _embed_query(embedding_model, query)
     results = collection.query(
         query_embeddings=[query_emb],
         n_results=top_k*8 if mmr else top_k*2,  # get more for MMR/hybrid
-        include=["documents", "metadatas", "distances"]
+        include=["documents", "metadatas", "distances", "embeddings"] if mmr else ["documents", "metadatas", "distances"]
+    )
+    return _rank_results(query, results, 0, top_k, hybrid, keyword_weight, return_scores, mmr, mmr_lambda)
+
+def retrieve_relevant_chunks_batch(
+    queries: List[str],
+    embedding_model: EmbeddingModel,
+    client: Optional["chromadb.Client"] = None,
+    collection_name: str = CHROMA_COLLECTION,
+    top_k: int = 5,
+    hybrid: bool = True,
+    keyword_weight: float = 0.2,
+    return_scores: bool = False,
+    mmr: bool = False,
+    mmr_lambda: float = 0.5
+) -> List[List[Dict[str, Any]]]:
+    """
+    Batched retrieve_relevant_chunks: one embedding call and one Chroma query for all queries.
+    Returns one hit list per query, in input order.
+    """
+    if not queries:
+        return []
+    if client is None:
+        client = get_chroma_client()
+    collection = get_or_create_collection(client, collection_name)
+    embed_all = getattr(embedding_model, 'embed_batch', embedding_model.embed)
+    query_embs = np.asarray(embed_all(list(queries)), dtype=np.float32)
+    results = collection.query(
+        query_embeddings=query_embs.tolist(),
+        n_results=top_k*8 if mmr else top_k*2,
+        include=["documents", "metadatas", "distances", "embeddings"] if mmr else ["documents", "metadatas", "distances"]
     )
+    return [
+        _rank_results(q, results, qi, top_k, hybrid, keyword_weight, return_scores, mmr, mmr_lambda)
+        for qi, q in enumerate(queries)
+    ]
+
+def _rank_results(
+    query: str,
+    results: Dict[str, Any],
+    qi: int,
+    top_k: int,
+    hybrid: bool,
+    keyword_weight: float,
+    return_scores: bool,
+    mmr: bool,
+    mmr_lambda: float
+) -> List[Dict[str, Any]]:
+    # Hybrid scoring, MMR and keyword fallback over the candidates Chroma returned for query `qi`
+    ids = results['ids'][qi]
+    documents = results['documents'][qi]
+    metadatas = results['metadatas'][qi]
+    distances = results['distances'][qi]
+    dists = np.asarray(distances, dtype=np.float64)
+    query_words = _query_tokens(query)
+    # Chunks indexed before keyword token sets were stored fall back to tokenizing the text
+    chunk_words = []
+    for meta, text in zip(metadatas, documents):
+        kw = meta.get('keyword_tokens')
+        chunk_words.append(set(kw.split()) if isinstance(kw, str) else set(normalize_text(text)))
+    overlaps = np.fromiter((len(query_words & words) for words in chunk_words), dtype=np.int32, count=len(dists))
+    scores = dists - keyword_weight * overlaps if hybrid else dists
+    # Rank by score (hybrid score or distance). Plain retrieval only needs the best top_k;
+    # MMR and the weak-result keyword fallback need the whole candidate pool ranked.
+    order = topk_indices(scores, top_k)
+    if mmr or (len(order) and dists[order[0]] > 0.7):
+        order = topk_indices(scores, len(scores))
+    # MMR (Maximal Marginal Relevance) for diversity, using cosine similarity between candidate embeddings
+    if mmr and len(order):
+        cand = np.asarray(results['embeddings'][qi], dtype=np.float32)[order]
+        cand /= np.maximum(np.linalg.norm(cand, axis=1, keepdims=True), 1e-12)
+        query_sims = (1 - dists[order]).astype(np.float32)
+        k = min(top_k, len(order))
+        chosen = [0]
+        remaining = np.ones(len(order), dtype=bool)
+        remaining[0] = False
+        # Running max similarity to the selected set: one matvec per pick instead of re-multiplying all picks
+        max_sim = cand @ cand[0]
+        while len(chosen) < k:
+            mmr_scores = mmr_lambda * query_sims - (1 - mmr_lambda) * max_sim
+            mmr_scores[~remaining] = -np.inf
+            idx = int(np.argmax(mmr_scores))
+            remaining[idx] = False
+            chosen.append(idx)
+            np.maximum(max_sim, cand @ cand[idx], out=max_sim)
+        order = order[chosen]
+    # Fallback: if all distances are high, do keyword search
+    if len(order) and dists[order[0]] > 0.7:
+        logging.info("Semantic search weak, using keyword fallback.")
+        keyword_order = [i for i in order if query_words & chunk_words[i]]
+        if keyword_order:
+            order = keyword_order
+    # Only the returned hits are materialized as dicts
     hits = []
-    query_words = set(normalize_text(query))
-    for i in range(len(results['ids'][0])):
+    for i in order[:top_k]:
         hit = {
-            'id': results['ids'][0][i],
-            'text': results['documents'][0][i],
-            'metadata': results['metadatas'][0][i],
-            'distance': results['distances'][0][i]
+            'id': ids[i],
+            'text': documents[i],
+            'metadata': metadatas[i],
+            'distance': distances[i]
         }
-        chunk_words = set(normalize_text(hit['text']))
-        overlap = len(query_words & chunk_words)
         if hybrid:
-            hit['hybrid_score'] = hit['distance'] - keyword_weight * overlap
+            hit['hybrid_score'] = float(scores[i])
             hit['score'] = hit['hybrid_score']
         else:
             hit['score'] = hit['distance']
@@ -210,54 +474,46 @@ def retrieve_relevant_chunks(
             if hybrid:
                 hit['raw_hybrid_score'] = hit['hybrid_score']
         hits.append(hit)
-    # Hybrid: sort by hybrid score
-    if hybrid:
-        hits.sort(key=lambda x: x['hybrid_score'])
-    else:
-        hits.sort(key=lambda x: x['distance'])
-    # MMR (Maximal Marginal Relevance) for diversity
-    if mmr and hits:
-        selected = []
-        candidates = hits.copy()
-        selected.append(candidates.pop(0))
-        while len(selected) < top_k and candidates:
-            mmr_scores = []
-            for cand in candidates:
-                sim_to_query = 1 - cand['distance']
-                sim_to_selected = max([1 - abs(cand['distance'] - sel['distance']) for sel in selected])
-                mmr_score = mmr_lambda * sim_to_query - (1 - mmr_lambda) * sim_to_selected
-                mmr_scores.append(mmr_score)
-            idx = mmr_scores.index(max(mmr_scores))
-            selected.append(candidates.pop(idx))
-        hits = selected
-    # Fallback: if all distances are high, do keyword search
-    if hits and hits[0]['distance'] > 0.7:
-        logging.info("Semantic search weak, using keyword fallback.")
-        keyword_hits = [h for h in hits if any(w in normalize_text(h['text']) for w in query_words)]
-        if keyword_hits:
-            return keyword_hits[:top_k]
-    return hits[:top_k]
+    return hits
 
 # --- Utility: Prepare Chunks for Embedding ---
+def _chunk_columns(chunks: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    # One pass from chunk dicts to the parallel ids/documents/metadatas lists collection.add takes
+    ids: List[str] = []
+    docs: List[str] = []
+    metas: List[Dict[str, Any]] = []
+    for chunk in chunks:
+        # Deterministic chunk id to avoid duplicate re-indexing across runs
+        chunk_id = chunk.get('chunk_id') or f"{chunk.get('doc_name','doc')}-{int(chunk.get('page',0))}-{int(chunk.get('chunk',0))}"
+        ids.append(chunk_id)
+        docs.append(chunk['text'])
+        meta = {k: v for k, v in chunk.items() if k != 'text'}
+        meta['chunk_id'] = chunk_id
+        if 'source' not in meta:
+            meta['source'] = f"{chunk.get('doc_name','doc')} - Page {chunk.get('page',0)}"
+        if 'timestamp' not in meta:
+            meta['timestamp'] = datetime.utcnow().isoformat()
+        if 'uuid' not in meta:
+            meta['uuid'] = str(uuid.uuid4())
+        # Token set for hybrid scoring, computed once here instead of on every query
+        meta['keyword_tokens'] = " ".join(sorted(set(normalize_text(chunk['text']))))
+        metas.append(meta)
+    return {'ids': ids, 'documents': docs, 'metadatas': metas}
+
 def prepare_chunks_for_embedding(
     summaries: List[Dict[str, Any]],
     doc_name: str,
     language: Optional[str] = None
-) -> List[Dict[str, Any]]:
+) -> Dict[str, List[Any]]:
     """
-    Add metadata to each chunk summary for embedding/indexing.
+    Add document metadata to each chunk summary and return Chroma-ready columns:
+    {"ids": [...], "documents": [...], "metadatas": [...]}, aligned by index.
     """
     for chunk in summaries:
         chunk['doc_name'] = doc_name
         if language:
             chunk['language'] = language
-        if 'source' not in chunk:
-            chunk['source'] = f"{doc_name} - Page {chunk.get('page', 0)}"
-        if 'timestamp' not in chunk:
-            chunk['timestamp'] = datetime.utcnow().isoformat()
-        if 'uuid' not in chunk:
-            chunk['uuid'] = str(uuid.uuid4())
-    return summaries
+    return _chunk_columns(summaries)
 
 # --- Security: Mask sensitive keys in logs ---
 def mask_key(key: str) -> str:
@@ -103,11 +103,28 @@ def _split_paragraphs(text: str, max_len: int = 4000) -> List[str]:
     return parts
 
 
+def _batch_chunks(chunks: List[str], max_texts: int = 50, max_chars: int = 100_000) -> List[List[str]]:
+    # DeepL caps a request at 50 texts and 128 KiB, so very long documents still take a few calls
+    batches: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for chunk in chunks:
+        if current and (len(current) >= max_texts or size + len(chunk) > max_chars):
+            batches.append(current)
+            current = []
+            size = 0
+        current.append(chunk)
+        size += len(chunk)
+    if current:
+        batches.append(current)
+    return batches
+
+
 @lru_cache(maxsize=512)
 def translate_text(text: str, target_lang: str, source_lang: Optional[str] = None) -> str:
     """
     Translate text using DeepL if available; otherwise return text unchanged.
-    Uses simple paragraph chunking and a small LRU cache to reduce cost.
+    Uses simple paragraph chunking (sent to DeepL as batched list requests) and a small LRU cache to reduce cost.
     """
     translator = get_deepl_translator()
     if translator is None:
@@ -115,16 +132,15 @@ def translate_text(text: str, target_lang: str, source_lang: Optional[str] = Non
     try:
         tgt = normalize_language_code(target_lang)
         src = normalize_language_code(source_lang) if source_lang else None
-        chunks = _split_paragraphs(text)
+        chunks = [chunk for chunk in _split_paragraphs(text) if chunk]
         outputs: List[str] = []
-        for chunk in chunks:
-            if not chunk:
-                continue
+        # One request per batch of chunks instead of per chunk
+        for batch in _batch_chunks(chunks):
             if src:
-                result = translator.translate_text(chunk, target_lang=tgt, source_lang=src)
+                results = translator.translate_text(batch, target_lang=tgt, source_lang=src)
             else:
-                result = translator.translate_text(chunk, target_lang=tgt)
-            outputs.append(result.text)
+                results = translator.translate_text(batch, target_lang=tgt)
+            outputs.extend(r.text for r in results)
         return "\n\n".join(outputs)
     except Exception as e:
         logging.error(f"DeepL translation failed, returning original text: {e}")
@@ -1,25 +1,28 @@
 import typer
 from typing import Optional
-from app.ingestion import ingest_document
-from app.embeddings import summarize_text
-from app.rag import EmbeddingModel, embed_chunks, get_chroma_client, get_or_create_collection
-from app.eval import load_jsonl
 import os
 
+# app.* modules (openai, tiktoken, fitz, chromadb, ...) are imported inside the commands that use them,
+# so `cli.py --help` and unrelated commands start without loading them
+
 app = typer.Typer(help="CLI for ingesting, indexing, and evaluating docs")
 
 
 @app.command()
 def ingest(file: str):
     """Ingest a local file and print brief metadata."""
-    doc = ingest_document(file)
+    from app.ingestion import ingest_document_cached
+    doc = ingest_document_cached(file)
     typer.echo(doc)
 
 
 @app.command()
 def index(file: str, collection: str = "doc_chunks"):
     """Ingest, summarize, and index a file into ChromaDB."""
-    doc = ingest_document(file)
+    from app.ingestion import ingest_document_cached
+    from app.embeddings import summarize_text
+    from app.rag import EmbeddingModel, embed_chunks, get_chroma_client
+    doc = ingest_document_cached(file)
     text = doc.get("text") or "\n".join(doc.get("text_by_page", []))
     chunks = summarize_text(text)
     # Add minimal metadata
@@ -27,18 +30,18 @@ def index(file: str, collection: str = "doc_chunks"):
         c["doc_name"] = doc.get("file_name", os.path.basename(file))
         c.setdefault("page", c.get("page", 0))
     embedder = EmbeddingModel(model_name='openai')
-    client = get_chroma_client()
-    _ = get_or_create_collection(client, collection)
-    embed_chunks(chunks, embedder, client=client, collection_name=collection)
+    # get_chroma_client/get_or_create_collection are lru_cached, so later commands reuse these handles
+    embed_chunks(chunks, embedder, client=get_chroma_client(), collection_name=collection)
     typer.echo(f"Indexed {len(chunks)} chunks into collection {collection}")
 
 
 @app.command()
 def drop(collection: str = "doc_chunks"):
     """Drop a ChromaDB collection."""
-    client = get_chroma_client()
+    from app.rag import get_chroma_client, get_or_create_collection
     try:
-        client.delete_collection(collection)
+        get_chroma_client().delete_collection(collection)
+        get_or_create_collection.cache_clear()
         typer.echo(f"Dropped collection {collection}")
     except Exception as e:
         typer.echo(f"Error: {e}")
@@ -47,24 +50,27 @@ def drop(collection: str = "doc_chunks"):
 @app.command()
 def eval(eval_file: str, top_k: int = 5, collection: str = "doc_chunks", out: str = "eval_results.jsonl"):
     """Run retrieval evaluation over JSONL file."""
-    from scripts.run_eval import main as run
-    # Delegate to the script for now
-    os.system(f"python scripts/run_eval.py {eval_file} --top_k {top_k} --collection {collection} --out {out}")
+    from app.rag import get_chroma_client
+    from scripts.run_eval import main as run_eval
+    run_eval(eval_file=eval_file, top_k=top_k, collection=collection, out=out, client=get_chroma_client())
 
 
 if __name__ == "__main__":
     app()
 
 import argparse
+import asyncio
+import io
 import os
+import sys
+import orjson
 from dotenv import load_dotenv
 load_dotenv()
 # Ensure OPENAI_API_KEY is set in your .env file or environment variables
-from app.ingestion import ingest_document
-from app.embeddings import summarize_document
-from app.rag import EmbeddingModel, embed_chunks, retrieve_relevant_chunks, prepare_chunks_for_embedding
-from app.qa import answer_query
-from pprint import pprint
+from app.ingestion import ingest_document_cached
+from app.embeddings import summarize_document_async
+from app.rag import EmbeddingModel, CachedEmbeddingModel, embed_chunks, retrieve_relevant_chunks, prepare_chunks_for_embedding, _embed_query
+from app.qa import answer_query, SemanticQACache
 
 
 def main():
@@ -73,16 +79,19 @@ def main():
     parser.add_argument('--query', type=str, required=True, help='Question to ask')
     parser.add_argument('--top_k', type=int, default=3, help='Number of chunks to retrieve')
     parser.add_argument('--embedding_model', type=str, default='openai', choices=['openai', 'sentence-transformers'], help='Embedding model to use')
+    parser.add_argument('--precision', type=str, default='auto', choices=['auto', 'fp32', 'fp16', 'int8'], help='SentenceTransformers precision (auto: fp16 on GPU, fp32 on CPU; int8: quantized ONNX on CPU)')
     parser.add_argument('--reembed', action='store_true', help='Force re-embedding of all chunks')
     parser.add_argument('--dry_run', action='store_true', help='Dry run (no actual embedding)')
+    parser.add_argument('--no_qa_cache', action='store_true', help='Always query the LLM instead of reusing answers to the same or near-identical questions')
+    parser.add_argument('--no_embedding_cache', action='store_true', help='Bypass the on-disk embedding cache (cache/embeddings.sqlite)')
     args = parser.parse_args()
 
     print(f"Ingesting document: {args.file}")
-    doc = ingest_document(args.file)
+    doc = ingest_document_cached(args.file)
     print(f"File: {doc['file_name']} | Type: {doc['file_type']}")
 
     print("\nSummarizing and chunking...")
-    summaries = summarize_document(
+    summaries = asyncio.run(summarize_document_async(
         doc,
         mode="document",
         model="gpt-3.5-turbo",
@@ -91,29 +100,62 @@ def main():
         chunk_max_tokens=512,
         overlap=40,
         cache=True
-    )
+    ))
     print(f"Generated {len(summaries)} chunks.")
 
     print("\nPreparing chunks for embedding...")
     chunks = prepare_chunks_for_embedding(summaries, doc_name=doc['file_name'], language=doc.get('language'))
 
+    if args.dry_run:
+        # Stop before loading an embedding model, opening Chroma or calling the LLM
+        embed_chunks(chunks, None, dry_run=True)
+        print("Dry run complete.")
+        return
+
     if args.embedding_model == 'openai':
         print(f"\nEmbedding chunks with OpenAI...")
         embedding_model = EmbeddingModel(model_name='openai', openai_model='text-embedding-3-small')
     else:
         print(f"\nEmbedding chunks with SentenceTransformers...")
-        embedding_model = EmbeddingModel(model_name='sentence-transformers', st_model='all-MiniLM-L6-v2')
-    embed_chunks(chunks, embedding_model, reembed=args.reembed, dry_run=args.dry_run)
+        embedding_model = EmbeddingModel(model_name='sentence-transformers', st_model='all-MiniLM-L6-v2', precision=args.precision)
+    if not args.no_embedding_cache:
+        # Unchanged chunks (and repeated queries) are served from disk instead of re-embedded
+        embedding_model = CachedEmbeddingModel(embedding_model)
+    embed_chunks(chunks, embedding_model, reembed=args.reembed)
     print("Embedding complete.")
 
-    print(f"\nRetrieving top {args.top_k} relevant chunks for your query...")
-    results = retrieve_relevant_chunks(args.query, embedding_model, top_k=args.top_k, hybrid=True, return_scores=True, mmr=True)
-    for i, r in enumerate(results):
-        print(f"\n--- Chunk {i+1} ---")
-        pprint({k: r[k] for k in ('score', 'text', 'metadata')})
-
-    print("\nGetting answer from LLM...")
-    answer = answer_query(args.query, results, model="gpt-3.5-turbo")
+    # Repeated or paraphrased questions about the same document skip retrieval and the LLM call
+    qa_cache = None if args.no_qa_cache else SemanticQACache()
+    # File mtime/size in the scope so answers about an edited document under the same name aren't reused
+    st = os.stat(args.file)
+    scope = f"{doc['file_name']}|{st.st_mtime_ns}|{st.st_size}|{embedding_model.name}"
+    answer = None
+    if qa_cache:
+        answer = qa_cache.get_exact(scope, args.query)
+        if answer is None:
+            # Same LRU that retrieve_relevant_chunks uses, so the query is embedded once
+            query_emb = _embed_query(embedding_model, args.query)
+            answer = qa_cache.get_similar(scope, query_emb)
+        if answer is not None:
+            print("\nAnswer served from QA cache.")
+
+    if answer is None:
+        print(f"\nRetrieving top {args.top_k} relevant chunks for your query...")
+        results = retrieve_relevant_chunks(args.query, embedding_model, top_k=args.top_k, hybrid=True, return_scores=True, mmr=True)
+        # Serialize all chunks with orjson into one buffer and write it once
+        buf = io.BytesIO()
+        for i, r in enumerate(results):
+            buf.write(f"\n--- Chunk {i+1} ---\n".encode())
+            buf.write(orjson.dumps({k: r[k] for k in ('score', 'text', 'metadata')}, option=orjson.OPT_INDENT_2))
+            buf.write(b"\n")
+        sys.stdout.flush()
+        sys.stdout.buffer.write(buf.getvalue())
+        sys.stdout.buffer.flush()
+
+        print("\nGetting answer from LLM...")
+        answer = answer_query(args.query, results, model="gpt-3.5-turbo")
+        if qa_cache:
+            qa_cache.put(scope, args.query, query_emb, answer)
     print("\n=== FINAL ANSWER ===")
     print(answer)
 
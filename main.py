@@ -2,10 +2,11 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 # Ensure OPENAI_API_KEY is set in your .env file or environment variables
-from app.ingestion import ingest_document
+from app.ingestion import ingest_document_cached
 from app.rag import EmbeddingModel, embed_chunks, retrieve_relevant_chunks, prepare_chunks_for_embedding
-from pprint import pprint
-import nltk
+import io
+import sys
+import orjson
 from app.embeddings import summarize_document
 
 #from app.embeddings import clear_cache
@@ -19,11 +20,14 @@ SAMPLE_FILE = os.path.join('Samples', 'tncd.pdf')  # Change to your test file
 
 SAMPLE_QUERY = "What treatment options are available for the patient wwith colerectal cancer?"
 
+# The per-page pass doubles LLM calls and is only printed; opt in with ENABLE_PAGE_SUMMARIES=1
+ENABLE_PAGE_SUMMARIES = os.getenv("ENABLE_PAGE_SUMMARIES", "0") == "1"
+
 
 def main():
     print(f"Ingesting document: {SAMPLE_FILE}")
     try:
-        doc = ingest_document(SAMPLE_FILE)
+        doc = ingest_document_cached(SAMPLE_FILE)
     except Exception as e:
         print(f"Error during ingestion: {e}")
         return
@@ -64,12 +68,17 @@ def main():
     # Run a sample query
     print(f"\n--- Retrieval Demo ---\nQuery: {SAMPLE_QUERY}")
     results = retrieve_relevant_chunks(SAMPLE_QUERY, openai_model, top_k=3, hybrid=True, return_scores=True, mmr=True)
-    print("\nTop retrieved chunks:")
+    buf = io.BytesIO()
+    buf.write(b"\nTop retrieved chunks:\n")
     for r in results:
-        pprint({k: r[k] for k in ('score', 'text', 'metadata')})
+        buf.write(orjson.dumps({k: r[k] for k in ('score', 'text', 'metadata')}, option=orjson.OPT_INDENT_2))
+        buf.write(b"\n")
+    sys.stdout.flush()
+    sys.stdout.buffer.write(buf.getvalue())
+    sys.stdout.buffer.flush()
 
     # Per-page summary (if PDF)
-    if doc.get('file_type') == 'pdf':
+    if ENABLE_PAGE_SUMMARIES and doc.get('file_type') == 'pdf':
         print("\n--- Per-Page Summaries ---")
         try:
             page_summaries = summarize_document(doc, mode="page", model="gpt-3.5-turbo", domain="general", max_tokens=256, chunk_max_tokens=512, overlap=40, cache=True)
@@ -82,7 +91,12 @@ if __name__ == "__main__":
     import uvicorn
     print("Starting FastAPI server on http://localhost:8000 ...")
     print("Make sure you have set your OPENAI_API_KEY in your environment or .env file.")
-    uvicorn.run("app.api:app", host="0.0.0.0", port=8000, reload=True)
+    try:
+        import uvloop  # noqa: F401  (not available on Windows)
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    uvicorn.run("app.api:app", host="0.0.0.0", port=8000, reload=True, loop=loop, http="httptools")
 else:
     print("Make sure you have set your OPENAI_API_KEY in your environment or .env file.")
 
@@ -1,38 +1,54 @@
 import argparse
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
 
-from app.rag import EmbeddingModel, retrieve_relevant_chunks, get_chroma_client, get_or_create_collection
-from app.eval import load_jsonl, save_jsonl, evaluate_single
 
+def main(eval_file: str, top_k: int = 5, collection: str = "doc_chunks", out: str = "eval_results.jsonl", client: Optional[Any] = None, batch_size: int = 64, max_workers: int = 8):
+    """Run retrieval evaluation over an eval JSONL file. Pass `client` to reuse an already open Chroma client."""
+    # Imported here so `--help` and argument errors don't load the RAG stack
+    import orjson
+    from app.rag import EmbeddingModel, retrieve_relevant_chunks_batch, get_chroma_client, get_or_create_collection
+    from app.eval import load_jsonl, evaluate_single
 
-def main():
+    eval_rows = load_jsonl(eval_file)
+    if client is None:
+        client = get_chroma_client()
+    _ = get_or_create_collection(client, collection)
+    embedder = EmbeddingModel(model_name='openai')
+
+    # One embedding call and one Chroma query per batch of queries, several batches in flight
+    queries = [row.get("query", "") for row in eval_rows]
+    batches = [range(i, min(i + batch_size, len(queries))) for i in range(0, len(queries), batch_size)]
+
+    def retrieve(idxs: range):
+        return retrieve_relevant_chunks_batch([queries[i] for i in idxs], embedder, client=client, collection_name=collection, top_k=top_k, hybrid=True, return_scores=True, mmr=True)
+
+    # Stream each result to disk so partial runs are kept and nothing accumulates in memory
+    with open(out, "wb") as f, ThreadPoolExecutor(max_workers=max_workers) as ex:
+        # map keeps input order; each batch is written as soon as it and its predecessors finish
+        for idxs, batched in zip(batches, ex.map(retrieve, batches)):
+            for i, results in zip(idxs, batched):
+                metrics = evaluate_single(queries[i], eval_rows[i], results, k=top_k)
+                rec = {"query": queries[i], **metrics}
+                f.write(orjson.dumps(rec) + b"\n")
+                print(rec)
+            f.flush()
+
+    print(f"Saved results to {out}")
+
+
+def cli():
     parser = argparse.ArgumentParser(description="Run RAG retrieval evaluation")
     parser.add_argument("eval_file", help="Path to eval JSONL (fields: query, relevant_refs, [cited_refs])")
     parser.add_argument("--top_k", type=int, default=5)
     parser.add_argument("--collection", type=str, default="doc_chunks")
     parser.add_argument("--out", type=str, default="eval_results.jsonl")
+    parser.add_argument("--batch_size", type=int, default=64, help="Queries per embedding call / Chroma query")
+    parser.add_argument("--workers", type=int, default=8, help="Batches retrieved concurrently")
     args = parser.parse_args()
-
-    eval_rows = load_jsonl(args.eval_file)
-    client = get_chroma_client()
-    _ = get_or_create_collection(client, args.collection)
-    embedder = EmbeddingModel(model_name='openai')
-
-    out_rows: List[Dict[str, Any]] = []
-    for row in eval_rows:
-        q = row.get("query", "")
-        results = retrieve_relevant_chunks(q, embedder, top_k=args.top_k, hybrid=True, return_scores=True, mmr=True)
-        metrics = evaluate_single(q, row, results, k=args.top_k)
-        out = {"query": q, **metrics}
-        out_rows.append(out)
-        print(out)
-
-    save_jsonl(args.out, out_rows)
-    print(f"Saved results to {args.out}")
+    main(args.eval_file, top_k=args.top_k, collection=args.collection, out=args.out, batch_size=args.batch_size, max_workers=args.workers)
 
 
 if __name__ == "__main__":
-    main()
-
-
+    cli()